@@ -0,0 +1,22 @@
+"""
+Маршруты для запуска под ASGI: горячие эндпоинты чтения заменены
+асинхронными обертками с теми же адресами, остальное берется из api.urls.
+"""
+from django.urls import re_path
+
+from api.async_views import async_read_view
+from api.urls import router
+from api.urls import urlpatterns as sync_urlpatterns
+
+ASYNC_ROUTES = (
+    'recipe-list', 'recipe-detail', 'tag-list', 'ingredient-list',
+)
+
+urlpatterns = [
+    re_path(
+        r'^api/' + pattern.pattern.regex.pattern.lstrip('^'),
+        async_read_view(pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in router.urls if pattern.name in ASYNC_ROUTES
+] + sync_urlpatterns
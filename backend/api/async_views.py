@@ -0,0 +1,58 @@
+"""
+Асинхронные обертки горячих эндпоинтов чтения для запуска под ASGI.
+
+В Django 3.2 нет асинхронного ORM, а синхронные представления под ASGI
+выполняются по очереди в одном потоке. Обертки выполняют те же
+DRF-представления в пуле потоков: запросы чтения не ждут друг друга,
+и медленный запрос к базе не блокирует остальные. Изменяющие запросы
+по тем же адресам выполняются как обычные синхронные представления.
+"""
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework.permissions import SAFE_METHODS
+
+from asgiref.sync import sync_to_async
+
+
+def _call_view(view, request, *args, **kwargs):
+    """
+    Выполняет представление и рендерит ответ в рабочем потоке.
+
+    Соединение с базой принадлежит потоку и после ответа остается
+    открытым для следующих запросов в этом потоке. Перед вызовом
+    закрываются только соединения с ошибками и старше CONN_MAX_AGE.
+    """
+    close_old_connections()
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    return response
+
+
+# Постоянный пул ограничивает число потоков, а с ним и число
+# открытых соединений с базой.
+_read_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_WORKERS,
+    thread_name_prefix='async-read',
+)
+_call_view_in_pool = sync_to_async(
+    _call_view, thread_sensitive=False, executor=_read_executor
+)
+_call_view_in_main_thread = sync_to_async(_call_view, thread_sensitive=True)
+
+
+def async_read_view(view):
+    """Асинхронное представление поверх синхронного DRF-представления."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await _call_view_in_pool(view, request, *args, **kwargs)
+        return await _call_view_in_main_thread(
+            view, request, *args, **kwargs
+        )
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
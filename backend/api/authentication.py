@@ -0,0 +1,97 @@
+"""
+Аутентификация подписанными токенами (AUTH_TOKEN_MODE=jwt).
+
+Подпись токена проверяется без запроса к базе, а строка пользователя
+берется из кэша на AUTH_USER_CACHE_TIMEOUT. Кэш сбрасывается сигналами
+при сохранении и удалении пользователя, поэтому деактивация, удаление
+и смена пароля действуют сразу, если кэш общий для воркеров
+(CACHE_BACKEND). С LocMemCache другие воркеры видят изменения
+не позже, чем через AUTH_USER_CACHE_TIMEOUT.
+
+Токен содержит хэш пароля (AUTH_HASH_CLAIM), смена пароля отзывает все
+выданные токены. При выходе jti токена записывается в таблицу
+RevokedToken до истечения токена: кэш по умолчанию свой у каждого
+воркера и вытесняет записи, отзыв в нем мог бы потеряться.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.constants import AUTH_USER_CACHE_TIMEOUT
+from users.models import RevokedToken
+
+JWT_MODE = 'jwt'
+AUTH_HASH_CLAIM = 'auth_hash'
+USER_KEY = 'auth:user:{}'
+
+
+def create_auth_token(user):
+    """Токен для входа в текущем режиме AUTH_TOKEN_MODE."""
+    if settings.AUTH_TOKEN_MODE != JWT_MODE:
+        return Token.objects.get_or_create(user=user)[0].key
+    token = AccessToken.for_user(user)
+    token[AUTH_HASH_CLAIM] = user.get_session_auth_hash()
+    return str(token)
+
+
+def revoke_token(token):
+    """Запрещает подписанный токен до истечения его срока."""
+    now = timezone.now()
+    expires_at = datetime.fromtimestamp(token['exp'], tz=timezone.utc)
+    if expires_at > now:
+        RevokedToken.objects.get_or_create(
+            jti=token[api_settings.JTI_CLAIM],
+            defaults={'expires_at': expires_at},
+        )
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+
+
+def get_cached_user(user_id):
+    user = cache.get(USER_KEY.format(user_id))
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is not None:
+            cache.set(USER_KEY.format(user_id), user, AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(USER_KEY.format(user_id))
+
+
+class SignedTokenAuthentication(JWTAuthentication):
+    """
+    Подписанный токен в заголовке "Authorization: Token <jwt>".
+    Токены без подписи пропускаются для TokenAuthentication.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None or raw_token.count(b'.') != 2:
+            return None
+        token = self.get_validated_token(raw_token)
+        if RevokedToken.objects.filter(
+            jti=token[api_settings.JTI_CLAIM]
+        ).exists():
+            raise AuthenticationFailed('Токен отозван.')
+        user = get_cached_user(token[api_settings.USER_ID_CLAIM])
+        if user is None or not user.is_active:
+            raise AuthenticationFailed('Пользователь не найден или неактивен.')
+        if not constant_time_compare(
+            token.get(AUTH_HASH_CLAIM, ''), user.get_session_auth_hash()
+        ):
+            raise AuthenticationFailed('Пароль изменен, войдите снова.')
+        return user, token
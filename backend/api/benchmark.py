@@ -0,0 +1,128 @@
+"""
+Нагрузочный HTTP-клиент на asyncio без сторонних зависимостей.
+
+Каждый из concurrency воркеров держит одно keep-alive соединение
+HTTP/1.1 и отправляет запросы по очереди, пока не будет выполнено
+заданное общее количество.
+"""
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+@dataclass
+class BenchmarkResult:
+    url: str
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)
+
+    @property
+    def throughput(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        """Перцентиль задержки в миллисекундах."""
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0] * 1000
+        return statistics.quantiles(
+            self.latencies, n=100, method='inclusive'
+        )[percent - 1] * 1000
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером.')
+    status = int(status_line.split()[1])
+    length = None
+    chunked = close = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        close = True
+    return status, close
+
+
+async def _worker(parts, path, headers, counter, total, result):
+    connection = None
+    while counter[0] < total:
+        counter[0] += 1
+        if connection is None:
+            try:
+                connection = await asyncio.open_connection(
+                    parts.hostname, parts.port or 80
+                )
+            except OSError:
+                result.errors += 1
+                continue
+        reader, writer = connection
+        request = (
+            f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+            + ''.join(f'{name}: {value}\r\n' for name, value in headers)
+            + '\r\n'
+        )
+        started = time.perf_counter()
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+            status, close = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            result.errors += 1
+            writer.close()
+            connection = None
+            continue
+        result.latencies.append(time.perf_counter() - started)
+        result.requests += 1
+        if status >= 400:
+            result.errors += 1
+        if close:
+            writer.close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _run(url, total, concurrency, headers):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path = f'{path}?{parts.query}'
+    result = BenchmarkResult(url)
+    counter = [0]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _worker(parts, path, headers, counter, total, result)
+        for _ in range(concurrency)
+    ))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_benchmark(url, total, concurrency, headers=()):
+    """Выполняет total GET-запросов к url с заданной конкурентностью."""
+    return asyncio.run(_run(url, total, concurrency, tuple(headers)))
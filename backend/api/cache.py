@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+
+COUNTS_CACHE = 'counts'
+# Версия количеств запросов, читающих таблицу.
+TABLE_COUNTS_CACHE = 'counts:{}'
+VERSION_KEY = 'version:{}'
+
+
+def get_cache_version(name):
+    """
+    Текущая версия пространства ключей кэша.
+
+    Ключи строятся с версией, поэтому для сброса всех значений
+    достаточно увеличить версию, не удаляя ключи по одному.
+    Версия — время последнего изменения в миллисекундах, при потере
+    ключа она начинается с текущего времени и не уменьшается.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(name):
+    """Увеличивает версию, делая устаревшими все ключи пространства."""
+    key = VERSION_KEY.format(name)
+    version = max(int(time.time() * 1000), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    return version
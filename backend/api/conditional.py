@@ -0,0 +1,55 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from api.cache import get_cache_version
+
+CATALOG_CACHE = 'catalog'
+PERSONAL_CACHE = 'user:{}'
+
+
+def get_personal_version(user):
+    """
+    Версия персональных данных пользователя: избранного,
+    корзины и подписок. Для анонимов всегда 0.
+    """
+    if not user.is_authenticated:
+        return 0
+    return get_cache_version(PERSONAL_CACHE.format(user.pk))
+
+
+def get_list_validators(request):
+    """ETag и Last-Modified списка рецептов."""
+    catalog_version = get_cache_version(CATALOG_CACHE)
+    personal_version = get_personal_version(request.user)
+    etag = hashlib.md5('{}:{}:{}:{}'.format(
+        catalog_version, request.user.pk, personal_version,
+        request.get_full_path()
+    ).encode()).hexdigest()
+    return f'"{etag}"', max(catalog_version, personal_version) // 1000
+
+
+def get_recipe_validators(request, recipe_id, modified):
+    """ETag и Last-Modified рецепта по дате его изменения."""
+    personal_version = get_personal_version(request.user)
+    modified = int(modified.timestamp() * 1000)
+    etag = f'"{recipe_id}-{modified}-{request.user.pk}-{personal_version}"'
+    return etag, max(modified, personal_version) // 1000
+
+
+def conditional_response(request, etag, last_modified):
+    """Ответ 304, если клиентская копия актуальна, иначе None."""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
@@ -11,3 +11,16 @@ MIN_AMOUNT_INGR = 1
 MAX_AMOUNT_INGR = 32000
 PAGENATION_SIZE = 6
 MAX_LENGTH_SHORT_LINK = 8
+MAX_LENGTH_TOKEN_ID = 255
+MAX_PAGENATION_SIZE = 100
+COUNT_CACHE_TIMEOUT = 60
+COUNT_ESTIMATE_THRESHOLD = 100000
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_MAX_SIZE = 256 * 1024
+RESPONSE_CACHE_TIMEOUT = 5 * 60
+SHORT_LINK_CACHE_SIZE = 10000
+IMAGE_RENDITIONS = (('list', 480), ('detail', 1200))
+IMAGE_RENDITION_QUALITY = 82
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+AUTH_USER_CACHE_TIMEOUT = 10
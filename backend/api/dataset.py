@@ -0,0 +1,394 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования.
+
+Популярность авторов, рецептов и ингредиентов распределена по закону
+Ципфа с показателем skew: несколько авторов и рецептов получают
+большую часть рецептов, избранного, корзин и подписчиков. Результат
+полностью определяется параметрами и seed.
+
+Строки пишутся пачками с явными первичными ключами после уже
+существующих: на PostgreSQL командой COPY, на остальных СУБД
+executemany в транзакции на пачку. bulk_create здесь не подходит:
+auto_now_add перезаписал бы даты публикации, а создание объектов
+моделей для миллионов строк занимает больше времени, чем сама вставка.
+У всех рецептов общий набор картинок-заглушек с готовыми копиями.
+"""
+import bisect
+import csv
+import io
+import itertools
+import json
+import random
+from dataclasses import dataclass, field, fields
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from PIL import Image, ImageDraw
+
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    make_short_id,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    ShoppingListIngredient,
+    Tag,
+)
+from recipes.renditions import PLACEHOLDER_DIR, render_renditions
+from users.models import CustomUser, Follow
+
+BATCH_SIZE = 20000
+PLACEHOLDER_MANIFEST = f'{PLACEHOLDER_DIR}renditions.json'
+PLACEHOLDER_COLORS = (
+    '#e07a5f', '#f2cc8f', '#81b29a', '#3d405b',
+    '#f4a261', '#2a9d8f', '#e9c46a', '#264653',
+)
+PLACEHOLDER_SIZE = (1200, 800)
+PUBLICATION_PERIOD = timedelta(days=3 * 365)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+
+
+@dataclass
+class DatasetOptions:
+    users: int = field(
+        default=1000, metadata={'help': 'Количество пользователей.'}
+    )
+    recipes: int = field(
+        default=10000, metadata={'help': 'Количество рецептов.'}
+    )
+    tags: int = field(default=8, metadata={
+        'help': 'Количество тегов, если их еще нет в базе.'
+    })
+    ingredients: int = field(default=2000, metadata={
+        'help': 'Количество ингредиентов, если их еще нет в базе.'
+    })
+    ingredients_per_recipe: int = field(
+        default=8, metadata={'help': 'Ингредиентов в рецепте.'}
+    )
+    tags_per_recipe: int = field(
+        default=2, metadata={'help': 'Тегов в рецепте.'}
+    )
+    favorites: int = field(default=20, metadata={
+        'help': 'Избранных рецептов на пользователя в среднем.'
+    })
+    carts: int = field(default=3, metadata={
+        'help': 'Рецептов в корзине пользователя в среднем.'
+    })
+    follows: int = field(default=10, metadata={
+        'help': 'Подписок на пользователя в среднем.'
+    })
+    skew: float = field(default=1.1, metadata={
+        'help': 'Показатель распределения Ципфа, 0 - равномерное.'
+    })
+    seed: int = field(
+        default=0, metadata={'help': 'Начальное значение генератора.'}
+    )
+
+
+@dataclass
+class DatasetResult:
+    user_ids: range
+    recipe_ids: range
+    tag_ids: list
+    ingredient_ids: list
+    rows: dict = field(default_factory=dict)
+
+
+def add_dataset_arguments(parser, **defaults):
+    """Параметры DatasetOptions как аргументы команды."""
+    for option in fields(DatasetOptions):
+        default = defaults.get(option.name, option.default)
+        parser.add_argument(
+            f'--{option.name.replace("_", "-")}', type=option.type,
+            default=default,
+            help=f'{option.metadata["help"]} По умолчанию {default}.'
+        )
+
+
+def get_dataset_options(options):
+    return DatasetOptions(**{
+        option.name: options[option.name]
+        for option in fields(DatasetOptions)
+    })
+
+
+class Popularity:
+    """Выбор значений с вероятностью, убывающей по закону Ципфа."""
+
+    def __init__(self, values, skew, rng):
+        self.values = list(values)
+        rng.shuffle(self.values)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, len(self.values) + 1)
+        ))
+        self.total = self.cum_weights[-1] if self.values else 0
+        self.rng = rng
+
+    def choice(self):
+        index = bisect.bisect(self.cum_weights, self.rng.random() * self.total)
+        return self.values[min(index, len(self.values) - 1)]
+
+    def sample(self, count):
+        """До count разных значений."""
+        count = min(count, len(self.values))
+        chosen = set()
+        for _ in range(count * 4):
+            if len(chosen) == count:
+                break
+            chosen.add(self.choice())
+        return chosen
+
+
+def _batched(rows, size):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def write_rows(model, names, rows, batch_size=BATCH_SIZE):
+    """
+    Вставляет кортежи значений полей names и возвращает число строк.
+    Даты и JSON передаются уже подготовленными для базы (prepare_value).
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    model_fields = [model._meta.get_field(name) for name in names]
+    columns = ', '.join(
+        connection.ops.quote_name(model_field.column)
+        for model_field in model_fields
+    )
+    placeholders = ', '.join(['%s'] * len(names))
+    total = 0
+    for batch in _batched(rows, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    batch
+                )
+        total += len(batch)
+    return total
+
+
+def prepare_value(model, name, value):
+    """Значение поля в виде, в котором его принимает база."""
+    return model._meta.get_field(name).get_db_prep_value(value, connection)
+
+
+def get_placeholders():
+    """
+    Картинки-заглушки и описания их копий. Файлы создаются один раз
+    и используются всеми сгенерированными рецептами.
+    """
+    if default_storage.exists(PLACEHOLDER_MANIFEST):
+        with default_storage.open(PLACEHOLDER_MANIFEST) as file:
+            return json.load(file)
+    placeholders = []
+    for number, color in enumerate(PLACEHOLDER_COLORS):
+        image = Image.new('RGB', PLACEHOLDER_SIZE, color)
+        ImageDraw.Draw(image).ellipse(
+            (300, 100, 900, 700), fill='#fafafa', outline='#333333', width=12
+        )
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=80)
+        name = default_storage.save(
+            f'{PLACEHOLDER_DIR}placeholder_{number}.jpg',
+            ContentFile(buffer.getvalue())
+        )
+        placeholders.append({
+            'image': name,
+            'renditions': {
+                'source': name,
+                'files': render_renditions(
+                    default_storage, name, PLACEHOLDER_DIR
+                ),
+            },
+        })
+    default_storage.save(
+        PLACEHOLDER_MANIFEST,
+        ContentFile(json.dumps(placeholders, indent=4).encode())
+    )
+    return placeholders
+
+
+def _next_id(model):
+    return (model.objects.aggregate(value=Max('id'))['value'] or 0) + 1
+
+
+def _user_prefix(first_user):
+    """
+    Префикс имен и почты пользователей запуска. Содержит первый id
+    запуска и проверяется на занятость, чтобы не совпасть
+    с существующими пользователями.
+    """
+    for attempt in itertools.count():
+        prefix = f'load{first_user}_' + (f'{attempt}_' if attempt else '')
+        if not CustomUser.objects.filter(
+            Q(username__startswith=prefix) | Q(email__startswith=prefix)
+        ).exists():
+            return prefix
+
+
+def _get_or_generate(model, count, make_row, names):
+    """id справочника; если он пуст, сначала создаются count записей."""
+    ids = list(model.objects.order_by('id').values_list('id', flat=True))
+    if ids:
+        return ids
+    write_rows(model, ('id',) + names, (
+        (index,) + make_row(index) for index in range(1, count + 1)
+    ))
+    return list(range(1, count + 1))
+
+
+def _spread(rng, average):
+    """Случайное количество со средним average."""
+    return rng.randint(0, 2 * average)
+
+
+def generate_dataset(options, batch_size=BATCH_SIZE, progress=None):
+    """Создает данные по параметрам options и возвращает DatasetResult."""
+    rng = random.Random(options.seed)
+    progress = progress or (lambda name, count: None)
+    now = timezone.now()
+    placeholders = get_placeholders()
+
+    tag_ids = _get_or_generate(
+        Tag, options.tags,
+        lambda index: (f'Тег {index}', f'tag{index}'), ('name', 'slug'),
+    )
+    ingredient_ids = _get_or_generate(
+        Ingredient, options.ingredients,
+        lambda index: (f'ингредиент {index}', UNITS[index % len(UNITS)]),
+        ('name', 'measurement_unit'),
+    )
+    first_user = _next_id(CustomUser)
+    user_ids = range(first_user, first_user + options.users)
+    first_recipe = _next_id(Recipe)
+    recipe_ids = range(first_recipe, first_recipe + options.recipes)
+    result = DatasetResult(user_ids, recipe_ids, tag_ids, ingredient_ids)
+
+    prefix = _user_prefix(first_user)
+    joined = prepare_value(CustomUser, 'date_joined', now)
+    # Пароль у всех пользователей неиспользуемый: вход по паролю
+    # сгенерированным пользователям не нужен.
+    result.rows['users'] = write_rows(CustomUser, (
+        'id', 'email', 'username', 'first_name', 'last_name', 'password',
+        'is_superuser', 'is_staff', 'is_active', 'date_joined',
+    ), (
+        (user_id, f'{prefix}{user_id}@example.com', f'{prefix}{user_id}',
+         'Имя', 'Фамилия', '!', False, False, True, joined)
+        for user_id in user_ids
+    ), batch_size)
+    progress('users', result.rows['users'])
+
+    authors = Popularity(user_ids, options.skew, rng)
+    step = PUBLICATION_PERIOD / max(options.recipes, 1)
+    start = now - PUBLICATION_PERIOD
+
+    images = [
+        (item['image'],
+         prepare_value(Recipe, 'image_renditions', item['renditions']))
+        for item in placeholders
+    ]
+
+    def recipes():
+        for number, recipe_id in enumerate(recipe_ids):
+            image, renditions = rng.choice(images)
+            published = prepare_value(
+                Recipe, 'pub_date', start + step * number
+            )
+            yield (
+                recipe_id, authors.choice(), f'Рецепт {recipe_id}',
+                'Описание рецепта', image, renditions, rng.randint(1, 180),
+                published, published, make_short_id(recipe_id),
+            )
+
+    result.rows['recipes'] = write_rows(Recipe, (
+        'id', 'author_id', 'name', 'text', 'image', 'image_renditions',
+        'cooking_time', 'pub_date', 'modified', 'short_id',
+    ), recipes(), batch_size)
+    progress('recipes', result.rows['recipes'])
+
+    tags = Popularity(tag_ids, options.skew, rng)
+    result.rows['recipe tags'] = write_rows(
+        Recipe.tags.through, ('recipe_id', 'tag_id'), (
+            (recipe_id, tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in tags.sample(rng.randint(1, options.tags_per_recipe))
+        ), batch_size
+    )
+    progress('recipe tags', result.rows['recipe tags'])
+
+    ingredients = Popularity(ingredient_ids, options.skew, rng)
+    result.rows['recipe ingredients'] = write_rows(
+        RecipeIngredient, ('recipe_id', 'ingredient_id', 'amount'), (
+            (recipe_id, ingredient_id, rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in ingredients.sample(
+                options.ingredients_per_recipe
+            )
+        ), batch_size
+    )
+    progress('recipe ingredients', result.rows['recipe ingredients'])
+
+    popular_recipes = Popularity(recipe_ids, options.skew, rng)
+    for name, model, average in (
+        ('favorites', FavoriteRecipe, options.favorites),
+        ('carts', ShoppingList, options.carts),
+    ):
+        result.rows[name] = write_rows(model, ('user_id', 'recipe_id'), (
+            (user_id, recipe_id)
+            for user_id in user_ids
+            for recipe_id in popular_recipes.sample(_spread(rng, average))
+        ), batch_size)
+        progress(name, result.rows[name])
+
+    result.rows['follows'] = write_rows(Follow, ('user_id', 'author_id'), (
+        (user_id, author_id)
+        for user_id in user_ids
+        for author_id in authors.sample(_spread(rng, options.follows))
+        if author_id != user_id
+    ), batch_size)
+    progress('follows', result.rows['follows'])
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [CustomUser, Tag, Ingredient, Recipe]
+        ):
+            cursor.execute(sql)
+    result.rows['shopping list totals'] = fill_shopping_list_totals(user_ids)
+    progress('shopping list totals', result.rows['shopping list totals'])
+    return result
+
+
+def fill_shopping_list_totals(user_ids):
+    """Суммы ингредиентов корзин пользователей одним INSERT ... SELECT."""
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(ShoppingListIngredient._meta.db_table)} '
+            '(user_id, ingredient_id, total_amount) '
+            'SELECT cart.user_id, item.ingredient_id, SUM(item.amount) '
+            f'FROM {quote(ShoppingList._meta.db_table)} AS cart '
+            f'JOIN {quote(RecipeIngredient._meta.db_table)} AS item '
+            'ON item.recipe_id = cart.recipe_id '
+            'WHERE cart.user_id BETWEEN %s AND %s '
+            'GROUP BY cart.user_id, item.ingredient_id',
+            [user_ids.start, user_ids.stop - 1]
+        )
+        return cursor.rowcount
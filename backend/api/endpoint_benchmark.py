@@ -0,0 +1,384 @@
+"""
+Замеры эндпоинтов API через тестовый клиент: задержка и число
+SQL-запросов для каждого действия вьюсетов.
+
+Данные создаются генератором api.dataset в пустой (тестовой) базе.
+Каждая итерация проходит все шаги из STEPS по порядку: изменяющие
+шаги создают свои объекты и удаляют их, поэтому состояние базы между
+итерациями не меняется.
+"""
+import base64
+import gc
+import io
+import json
+import math
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from PIL import Image
+
+from api.authentication import create_auth_token
+from api.benchmark import BenchmarkResult
+from api.dataset import generate_dataset
+from recipes.models import Recipe, Tag
+from recipes.renditions import wait_for_renditions
+from recipes.search import rebuild_search_index
+from users.models import CustomUser
+
+PASSWORDS = ('cinnamon-Lq74', 'paprika-Zx93')
+
+
+@dataclass
+class EndpointResult(BenchmarkResult):
+    queries: list = field(default_factory=list)
+
+    @property
+    def max_queries(self):
+        return max(self.queries, default=0)
+
+
+@dataclass
+class Step:
+    """
+    Запрос одного эндпоинта. В path и data подставляются значения
+    контекста итерации, save сохраняет id из ответа в контекст,
+    relogin выдает пользователю новый токен после шага.
+    """
+    name: str
+    method: str
+    path: str
+    user: str = None
+    data: object = None
+    status: int = status.HTTP_200_OK
+    save: str = None
+    relogin: bool = False
+
+
+def _image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'orange').save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+IMAGE = _image()
+
+RECIPE_DATA = {
+    'name': 'Рецепт {iteration}',
+    'text': 'Описание',
+    'cooking_time': 10,
+    'image': IMAGE,
+    'tags': ['{tag}'],
+    'ingredients': [
+        {'id': '{ingredient}', 'amount': 100},
+        {'id': '{other_ingredient}', 'amount': 5},
+    ],
+}
+
+STEPS = (
+    Step('tag-list', 'get', '/api/tags/'),
+    Step('tag-detail', 'get', '/api/tags/{tag}/'),
+    Step('ingredient-list', 'get', '/api/ingredients/'),
+    Step('ingredient-list:search', 'get', '/api/ingredients/?name=инг'),
+    Step('ingredient-detail', 'get', '/api/ingredients/{ingredient}/'),
+    Step('recipe-list:anonymous', 'get', '/api/recipes/'),
+    Step('recipe-list', 'get', '/api/recipes/', 'reader'),
+    Step('recipe-list:cursor', 'get', '/api/recipes/?pagination=cursor',
+         'reader'),
+    Step('recipe-list:favorited', 'get', '/api/recipes/?is_favorited=1',
+         'reader'),
+    Step('recipe-list:in-cart', 'get',
+         '/api/recipes/?is_in_shopping_cart=1', 'reader'),
+    Step('recipe-list:author', 'get', '/api/recipes/?author={author}',
+         'reader'),
+    Step('recipe-list:tags', 'get', '/api/recipes/?tags={tag_slug}',
+         'reader'),
+    # Слово «рецепт» есть во всех названиях, номер выбирает несколько.
+    Step('recipe-list:search', 'get', '/api/recipes/?search=рецепт {recipe}',
+         'reader'),
+    Step('recipe-detail:anonymous', 'get', '/api/recipes/{recipe}/'),
+    Step('recipe-detail', 'get', '/api/recipes/{recipe}/', 'reader'),
+    Step('recipe-get-link', 'get', '/api/recipes/{recipe}/get-link/'),
+    Step('redirect-to-recipe', 'get', '/s/{short_id}/',
+         status=status.HTTP_302_FOUND),
+    Step('recipe-download-shopping-cart', 'get',
+         '/api/recipes/download_shopping_cart/', 'reader'),
+    Step('recipe-download-shopping-cart:pdf', 'get',
+         '/api/recipes/download_shopping_cart/?file_format=pdf', 'reader'),
+    Step('user-list', 'get', '/api/users/'),
+    Step('user-detail', 'get', '/api/users/{author}/', 'reader'),
+    Step('user-me', 'get', '/api/users/me/', 'reader'),
+    Step('user-subscriptions', 'get',
+         '/api/users/subscriptions/?recipes_limit=3', 'reader'),
+    Step('user-create', 'post', '/api/users/', data={
+        'email': 'benchmark{iteration}@example.com',
+        'username': 'benchmark{iteration}',
+        'first_name': 'Имя',
+        'last_name': 'Фамилия',
+        'password': PASSWORDS[0],
+    }, status=status.HTTP_201_CREATED, save='new_user'),
+    Step('user-subscribe', 'post', '/api/users/{new_user}/subscribe/',
+         'reader', status=status.HTTP_201_CREATED),
+    Step('user-remove-subscription', 'delete',
+         '/api/users/{new_user}/subscribe/', 'reader',
+         status=status.HTTP_204_NO_CONTENT),
+    Step('user-set-avatar', 'put', '/api/users/me/avatar/', 'reader',
+         data={'avatar': IMAGE}),
+    Step('user-delete-avatar', 'delete', '/api/users/me/avatar/', 'reader',
+         status=status.HTTP_204_NO_CONTENT),
+    Step('user-set-password', 'post', '/api/users/set_password/', 'reader',
+         data={'current_password': '{password}',
+               'new_password': '{new_password}'},
+         status=status.HTTP_204_NO_CONTENT,
+         # Смена пароля отзывает подписанные токены.
+         relogin=True),
+    Step('recipe-create', 'post', '/api/recipes/', 'reader',
+         data=RECIPE_DATA, status=status.HTTP_201_CREATED,
+         save='new_recipe'),
+    Step('recipe-partial-update', 'patch', '/api/recipes/{new_recipe}/',
+         'reader', data={**RECIPE_DATA, 'cooking_time': 20}),
+    Step('recipe-favorite', 'post', '/api/recipes/{new_recipe}/favorite/',
+         'reader', status=status.HTTP_201_CREATED),
+    Step('recipe-remove-favorite', 'delete',
+         '/api/recipes/{new_recipe}/favorite/', 'reader',
+         status=status.HTTP_204_NO_CONTENT),
+    Step('recipe-shopping-cart', 'post',
+         '/api/recipes/{new_recipe}/shopping_cart/', 'reader',
+         status=status.HTTP_201_CREATED),
+    Step('recipe-remove-shopping-cart', 'delete',
+         '/api/recipes/{new_recipe}/shopping_cart/', 'reader',
+         status=status.HTTP_204_NO_CONTENT),
+    Step('recipe-destroy', 'delete', '/api/recipes/{new_recipe}/', 'reader',
+         status=status.HTTP_204_NO_CONTENT),
+)
+
+
+def seed_dataset(options):
+    """Заполняет пустую базу и возвращает контекст для шагов."""
+    dataset = generate_dataset(options)
+    rebuild_search_index()
+    if connection.vendor == 'postgresql':
+        # Без свежей статистики планы зависят от того, успел ли
+        # autovacuum обработать таблицы после предыдущих тестов.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    reader = CustomUser.objects.get(id=dataset.user_ids[0])
+    reader.set_password(PASSWORDS[0])
+    reader.save(update_fields=['password'])
+    recipe = Recipe.objects.get(id=dataset.recipe_ids[0])
+    tag = Tag.objects.get(id=dataset.tag_ids[0])
+    return {
+        'users': {'reader': reader.id},
+        'tokens': {'reader': create_auth_token(reader)},
+        'recipe': recipe.id,
+        'short_id': recipe.short_id,
+        'author': recipe.author_id,
+        'tag': tag.id,
+        'tag_slug': tag.slug,
+        'ingredient': dataset.ingredient_ids[0],
+        'other_ingredient': dataset.ingredient_ids[1],
+    }
+
+
+def _render(value, context):
+    """Подставляет контекст в строки, сохраняя тип целых значений."""
+    if isinstance(value, dict):
+        return {key: _render(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_render(item, context) for item in value]
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and (
+            isinstance(context.get(value[1:-1]), int)
+        ):
+            return context[value[1:-1]]
+        return value.format(**context)
+    return value
+
+
+def _request(client, step, context):
+    response = getattr(client, step.method)(
+        step.path.format(**context),
+        _render(step.data, context), format='json',
+    )
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def select_steps(names=None):
+    """
+    Шаги с данными именами. Изменяющие шаги зависят от предыдущих,
+    поэтому вместе с ними выполняются все шаги, создающие данные.
+    """
+    if not names:
+        return STEPS
+    return [step for step in STEPS if step.name in names or step.save]
+
+
+def _collect(queries):
+    def wrapper(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+def iterate_steps(context, iterations, steps=STEPS):
+    """
+    Выполняет шаги iterations раз. Для каждого запроса возвращает
+    номер итерации, шаг, ответ, время и выполненные SQL с параметрами.
+    """
+    clients = {None: APIClient()}
+    for name, key in context['tokens'].items():
+        clients[name] = APIClient()
+        clients[name].credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    for iteration in range(iterations):
+        context.update(
+            iteration=iteration,
+            password=PASSWORDS[iteration % 2],
+            new_password=PASSWORDS[(iteration + 1) % 2],
+        )
+        # Как в timeit, сборщик мусора не запускается во время замеров:
+        # полная сборка занимает до 100 мс и попадала бы в случайные шаги.
+        gc.collect()
+        for step in steps:
+            queries = []
+            gc.disable()
+            try:
+                with connection.execute_wrapper(_collect(queries)):
+                    started = time.perf_counter()
+                    response = _request(clients[step.user], step, context)
+                    elapsed = time.perf_counter() - started
+            finally:
+                gc.enable()
+            # Фоновое построение копий картинок не должно совпадать
+            # с замерами следующих шагов.
+            wait_for_renditions()
+            if step.relogin:
+                user = CustomUser.objects.get(id=context['users'][step.user])
+                clients[step.user].credentials(
+                    HTTP_AUTHORIZATION=f'Token {create_auth_token(user)}'
+                )
+            if step.save:
+                if response.status_code != step.status:
+                    raise RuntimeError(
+                        f'{step.name}: ответ {response.status_code} '
+                        f'{response.content[:500]!r}'
+                    )
+                context[step.save] = response.data['id']
+            yield iteration, step, response, elapsed, queries
+
+
+def run_steps(context, iterations, warmup=0, steps=STEPS):
+    """Выполняет шаги и возвращает результаты замеров по шагам."""
+    results = {step.name: EndpointResult(step.name) for step in steps}
+    for iteration, step, response, elapsed, queries in iterate_steps(
+        context, warmup + iterations, steps
+    ):
+        if iteration < warmup:
+            continue
+        result = results[step.name]
+        result.requests += 1
+        result.elapsed += elapsed
+        result.latencies.append(elapsed)
+        result.queries.append(len(queries))
+        if response.status_code != step.status:
+            result.errors += 1
+    return list(results.values())
+
+
+@contextmanager
+def benchmark_database(options):
+    """
+    Тестовая база с данными по options и временный MEDIA_ROOT.
+    Возвращает контекст для шагов, после выхода база удаляется.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            cache.clear()
+            try:
+                yield seed_dataset(options)
+            finally:
+                # Копии картинок строятся в фоне во временном MEDIA_ROOT.
+                wait_for_renditions()
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def load_budget(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def make_budget(results, headroom, vendor, previous=None):
+    """
+    Бюджет по замерам: число запросов для СУБД vendor и p95 с запасом.
+    Число запросов других СУБД берется из прежнего бюджета previous.
+    """
+    previous = previous or {}
+    budget = {}
+    for result in results:
+        queries = dict(previous.get(result.url, {}).get('queries', {}))
+        queries[vendor] = result.max_queries
+        budget[result.url] = {
+            'queries': dict(sorted(queries.items())),
+            'p95_ms': math.ceil(result.percentile(95) * headroom),
+        }
+    return budget
+
+
+def check_budget(results, budget, vendor):
+    """
+    Возвращает описания превышений бюджета запросов для СУБД vendor
+    и ошибок ответов.
+    """
+    problems = []
+    for result in results:
+        if result.errors:
+            problems.append(
+                f'{result.url}: неожиданный статус ответа '
+                f'в {result.errors} запросах'
+            )
+        limit = budget.get(result.url, {}).get('queries', {}).get(vendor)
+        if limit is not None and result.max_queries > limit:
+            problems.append(
+                f'{result.url}: {result.max_queries} SQL-запросов, '
+                f'бюджет {limit}'
+            )
+    return problems
+
+
+def check_latency(results, budget):
+    """
+    Возвращает описания превышений p95. Задержка зависит от машины,
+    поэтому по умолчанию превышения только выводятся.
+    """
+    problems = []
+    for result in results:
+        limit = budget.get(result.url, {}).get('p95_ms')
+        p95 = result.percentile(95)
+        if limit is not None and p95 > limit:
+            problems.append(
+                f'{result.url}: p95 {p95:.1f} мс, бюджет {limit} мс'
+            )
+    return problems
@@ -0,0 +1,87 @@
+import io
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from PIL import Image, UnidentifiedImageError
+
+from api.constants import MAX_IMAGE_PIXELS, MAX_IMAGE_UPLOAD_SIZE
+
+TOO_LARGE_MESSAGE = (
+    f'Размер файла не должен превышать {MAX_IMAGE_UPLOAD_SIZE // 2 ** 20} МБ.'
+)
+TOO_MANY_PIXELS_MESSAGE = (
+    f'Разрешение картинки не должно превышать {MAX_IMAGE_PIXELS} пикселей.'
+)
+# Длина base64-строки с заголовком data:, соответствующая предельному
+# размеру файла.
+MAX_BASE64_LENGTH = MAX_IMAGE_UPLOAD_SIZE * 4 // 3 + 128
+
+
+def check_image_header(file, size):
+    """
+    Проверяет размер файла и разрешение картинки по заголовку,
+    не декодируя изображение целиком.
+    """
+    if size > MAX_IMAGE_UPLOAD_SIZE:
+        raise serializers.ValidationError(TOO_LARGE_MESSAGE)
+    try:
+        width, height = Image.open(file).size
+    except Image.DecompressionBombError:
+        # Pillow сам отклоняет картинки намного больше своего предела.
+        raise serializers.ValidationError(TOO_MANY_PIXELS_MESSAGE)
+    except (UnidentifiedImageError, OSError):
+        raise serializers.ValidationError('Загрузите корректное изображение.')
+    finally:
+        file.seek(0)
+    if width * height > MAX_IMAGE_PIXELS:
+        raise serializers.ValidationError(TOO_MANY_PIXELS_MESSAGE)
+
+
+class HybridImageField(Base64ImageField):
+    """
+    Картинка в base64 внутри JSON или файлом из multipart/form-data
+    и тела запроса. Загруженные файлы не перекодируются в base64.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            check_image_header(data, data.size)
+            return serializers.ImageField.to_internal_value(self, data)
+        if isinstance(data, str) and len(data) > MAX_BASE64_LENGTH:
+            raise serializers.ValidationError(TOO_LARGE_MESSAGE)
+        return super().to_internal_value(data)
+
+    def get_file_extension(self, filename, decoded_file):
+        check_image_header(io.BytesIO(decoded_file), len(decoded_file))
+        return super().get_file_extension(filename, decoded_file)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField без запроса к базе на каждое значение:
+    проверяется только тип первичного ключа, объекты загружает
+    сериализатор одним запросом (load_objects). Сообщения об ошибках
+    те же, что у PrimaryKeyRelatedField.
+    """
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def load_objects(self, pks):
+        """Объекты по первичным ключам и ошибки для ненайденных."""
+        objects = self.get_queryset().in_bulk(pks)
+        errors = {
+            pk: self.error_messages['does_not_exist'].format(pk_value=pk)
+            for pk in pks if pk not in objects
+        }
+        return objects, errors
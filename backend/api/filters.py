@@ -1,6 +1,54 @@
+from django import forms
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from api.cache import get_cache_version
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+TAGS_CACHE = 'tags'
+
+
+def get_tag_ids(slugs):
+    """
+    Id тегов по слагам из закэшированного словаря slug -> id.
+    Словарь общий для всех запросов, поэтому строится по основной базе.
+    """
+    key = f'tag_ids:{get_cache_version(TAGS_CACHE)}'
+    tag_ids = cache.get(key)
+    if tag_ids is None:
+        tag_ids = dict(
+            Tag.objects.using(DEFAULT_DB_ALIAS).values_list('slug', 'id')
+        )
+        cache.set(key, tag_ids, None)
+    return [tag_ids[slug] for slug in slugs if slug in tag_ids]
+
+
+class MultipleValueField(forms.Field):
+    """Поле со списком значений из повторяющегося параметра запроса."""
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class TagsFilter(filters.Filter):
+    """
+    Фильтр по слагам тегов.
+
+    Не строит список вариантов запросом к базе и фильтрует через EXISTS,
+    поэтому рецепты с несколькими тегами не дублируются.
+    """
+    field_class = MultipleValueField
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=get_tag_ids(value)
+        )))
 
 
 class RecipeFilterSet(filters.FilterSet):
@@ -9,11 +57,14 @@ class RecipeFilterSet(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_favorited')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_shopping_cart')
     author = filters.NumberFilter(field_name='author_id')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagsFilter()
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'author', 'tags', 'search'
+        )
 
     def filter_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -25,6 +76,10 @@ class RecipeFilterSet(filters.FilterSet):
             return queryset.filter(in_shopping_carts__user=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, описанию и ингредиентам."""
+        return search_recipes(queryset, value)
+
 
 class IngredientFilterSet(filters.FilterSet):
     """Фильтр по ингридиентам"""
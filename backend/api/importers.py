@@ -0,0 +1,243 @@
+"""
+Пакетный идемпотентный импорт справочников из CSV и JSON.
+
+Файлы читаются потоково: CSV построчно, JSON-массив и JSON Lines
+по одному объекту. Строки вставляются пачками, уже существующие записи
+пропускаются по ограничениям уникальности, поэтому импорт можно
+запускать повторно. На PostgreSQL пачка загружается командой COPY
+во временную таблицу и переносится INSERT ... ON CONFLICT DO NOTHING,
+на остальных СУБД — INSERT с пропуском конфликтов (INSERT OR IGNORE).
+"""
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import bump_cache_version
+
+BATCH_SIZE = 10000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ImportResult:
+    total: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    invalid: int = 0
+
+
+def read_csv(file, fields):
+    """Строки CSV; строка заголовка с именами полей пропускается."""
+    for number, row in enumerate(csv.reader(file)):
+        if number == 0 and [value.strip() for value in row] == list(fields):
+            continue
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_json(file):
+    """Объекты JSON-массива или JSON Lines без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(JSON_CHUNK_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+        position = end
+
+
+def read_rows(path, fields):
+    """Строки файла в виде словарей, формат определяется расширением."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as file:
+        if extension == '.csv':
+            yield from read_csv(file, fields)
+        elif extension in ('.json', '.jsonl'):
+            yield from read_json(file)
+        else:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+
+
+class BulkImporter:
+    """Вставляет строки модели пачками, пропуская существующие."""
+
+    def __init__(self, model, fields, batch_size=BATCH_SIZE):
+        self.model = model
+        self.fields = tuple(fields)
+        self.batch_size = batch_size
+        self.max_lengths = {
+            name: model._meta.get_field(name).max_length for name in fields
+        }
+
+    def clean(self, row):
+        """Значения полей строки или None, если строка некорректна."""
+        if not isinstance(row, dict):
+            return None
+        values = []
+        for name in self.fields:
+            value = row.get(name)
+            if not isinstance(value, str):
+                return None
+            value = value.strip()
+            max_length = self.max_lengths[name]
+            if not value or (max_length and len(value) > max_length):
+                return None
+            values.append(value)
+        return tuple(values)
+
+    def run(self, rows, progress=None):
+        result = ImportResult()
+        batch = []
+        for row in rows:
+            result.total += 1
+            values = self.clean(row)
+            if values is None:
+                result.invalid += 1
+                continue
+            batch.append(values)
+            if len(batch) >= self.batch_size:
+                result.inserted += self.insert(batch)
+                batch = []
+                if progress:
+                    progress(result)
+        if batch:
+            result.inserted += self.insert(batch)
+        result.skipped = result.total - result.invalid - result.inserted
+        if progress:
+            progress(result)
+        return result
+
+    def insert(self, batch):
+        """Вставляет пачку и возвращает количество новых строк."""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                return self._copy(batch)
+            return self._insert(batch)
+
+    def _table_columns(self):
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(self.model._meta.get_field(name).column)
+            for name in self.fields
+        )
+        return table, columns
+
+    def _insert(self, batch):
+        """
+        INSERT с пропуском конфликтов; число новых строк берется
+        из rowcount, без подсчета строк таблицы до и после.
+        """
+        table, columns = self._table_columns()
+        statement = connection.ops.insert_statement(ignore_conflicts=True)
+        suffix = connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True
+        )
+        size = connection.ops.bulk_batch_size(
+            [self.model._meta.get_field(name) for name in self.fields], batch
+        )
+        row = '(' + ', '.join(['%s'] * len(self.fields)) + ')'
+        inserted = 0
+        with connection.cursor() as cursor:
+            for start in range(0, len(batch), size):
+                chunk = batch[start:start + size]
+                cursor.execute(
+                    f'{statement} {table} ({columns}) '
+                    f'VALUES {", ".join([row] * len(chunk))} {suffix}',
+                    [value for values in chunk for value in values]
+                )
+                inserted += cursor.rowcount
+        return inserted
+
+    def _copy(self, batch):
+        table, columns = self._table_columns()
+        staging = connection.ops.quote_name(
+            f'{self.model._meta.db_table}_import'
+        )
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.execute(f'TRUNCATE {staging}')
+            cursor.copy_expert(
+                f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM {staging} '
+                'ON CONFLICT DO NOTHING'
+            )
+            return cursor.rowcount
+
+
+class ImportCommand(BaseCommand):
+    """
+    Основа команд импорта справочников. Наследники задают модель,
+    поля, файл по умолчанию и версии кэша, которые нужно сбросить:
+    bulk-вставка не вызывает сигналы post_save.
+    """
+    model = None
+    fields = ()
+    default_path = None
+    cache_names = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(self.default_path),
+            help='Файл CSV, JSON или JSON Lines.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одной пачке.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        importer = BulkImporter(
+            self.model, self.fields, batch_size=options['batch_size']
+        )
+        result = importer.run(
+            read_rows(path, self.fields), progress=self.report_progress
+        )
+        self.stdout.write('')
+        if result.inserted:
+            for name in self.cache_names:
+                bump_cache_version(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'{self.model._meta.verbose_name_plural}: '
+            f'прочитано {result.total}, добавлено {result.inserted}, '
+            f'пропущено {result.skipped}, с ошибками {result.invalid}.'
+        ))
+
+    def report_progress(self, result):
+        self.stdout.write(
+            f'Обработано строк: {result.total}', ending='\r'
+        )
+        self.stdout.flush()
@@ -0,0 +1,64 @@
+import bisect
+import threading
+
+from django.db import DEFAULT_DB_ALIAS
+
+from api.cache import get_cache_version
+from recipes.models import Ingredient
+
+INGREDIENTS_CACHE = 'ingredients'
+
+
+def index_rows():
+    """
+    Все ингредиенты: индекс строится по полной таблице основной базы,
+    чтобы не взять с реплики строки старше версии индекса.
+    """
+    return Ingredient.objects.using(DEFAULT_DB_ALIAS).values(
+        'id', 'name', 'measurement_unit'
+    )
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов в памяти процесса.
+
+    Названия приводятся к casefold и хранятся отсортированными,
+    поиск по префиксу выполняется двоичным поиском. Индекс строится
+    при первом обращении и перестраивается, когда меняется версия
+    INGREDIENTS_CACHE. Изменения видны всем воркерам gunicorn, только
+    если кэш общий (CACHE_BACKEND): с LocMemCache по умолчанию версия
+    своя в каждом процессе, и воркер видит лишь свои изменения.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Версия, ключи и строки меняются одним присваиванием, чтобы
+        # поиск без блокировки не получил ключи одной версии
+        # и строки другой.
+        self._data = (None, [], [])
+
+    def _build(self, version):
+        rows = sorted(
+            index_rows(),
+            key=lambda row: (row['name'].casefold(), row['id'])
+        )
+        self._data = (
+            version, [row['name'].casefold() for row in rows], rows
+        )
+
+    def search(self, prefix=''):
+        """Возвращает версию индекса и ингредиенты с данным префиксом."""
+        version = get_cache_version(INGREDIENTS_CACHE)
+        if version != self._data[0]:
+            with self._lock:
+                if version != self._data[0]:
+                    self._build(version)
+        _, keys, rows = self._data
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_right(keys, prefix + chr(0x10FFFF), lo=start)
+        return version, rows[start:end]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import run_benchmark
+from recipes.models import Recipe
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/{recipe_id}/',
+    '/api/tags/',
+    '/api/ingredients/?name=%D1%81',
+    '/s/{short_id}/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение пропускной способности эндпоинтов чтения на двух '
+        'запущенных серверах: синхронном (gunicorn + wsgi) и ASGI '
+        '(gunicorn -k uvicorn.workers.UvicornWorker + asgi).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sync-url', default='http://127.0.0.1:8000',
+            help='Адрес сервера с синхронным стеком.'
+        )
+        parser.add_argument(
+            '--async-url', default='http://127.0.0.1:8001',
+            help='Адрес сервера с ASGI-стеком.'
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь для проверки, можно указать несколько раз. '
+                 'Подстановки: {recipe_id}, {short_id}.'
+        )
+        parser.add_argument(
+            '-n', '--requests', type=int, default=2000,
+            help='Количество запросов к каждому пути.'
+        )
+        parser.add_argument(
+            '-c', '--concurrency', type=int, default=200,
+            help='Количество одновременных соединений.'
+        )
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        if recipe is None:
+            raise CommandError('Для проверки нужен хотя бы один рецепт.')
+        paths = [
+            path.format(recipe_id=recipe.id, short_id=recipe.short_id)
+            for path in options['paths'] or DEFAULT_PATHS
+        ]
+        self.stdout.write(
+            f'{"Путь":<40}{"Стек":<8}{"запр/с":>10}'
+            f'{"p50, мс":>10}{"p95, мс":>10}{"ошибки":>8}'
+        )
+        for path in paths:
+            for stack in ('sync', 'async'):
+                result = run_benchmark(
+                    options[f'{stack}_url'].rstrip('/') + path,
+                    options['requests'], options['concurrency'],
+                )
+                self.stdout.write(
+                    f'{path[:39]:<40}{stack:<8}{result.throughput:>10.1f}'
+                    f'{result.percentile(50):>10.1f}'
+                    f'{result.percentile(95):>10.1f}{result.errors:>8}'
+                )
@@ -0,0 +1,123 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.dataset import add_dataset_arguments, get_dataset_options
+from api.endpoint_benchmark import (
+    benchmark_database,
+    check_budget,
+    check_latency,
+    load_budget,
+    make_budget,
+    run_steps,
+    select_steps,
+)
+
+DEFAULT_BUDGET = 'data/endpoint_budgets.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки и числа SQL-запросов всех действий вьюсетов '
+        'на сгенерированных данных в тестовой базе. Завершается с ошибкой, '
+        'если число запросов превышает бюджет текущей СУБД из файла; '
+        'превышение p95 только выводится, если не указан --strict-latency.'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, users=50, recipes=500, carts=5)
+        parser.add_argument(
+            '-n', '--iterations', type=int, default=30,
+            help='Количество замеров каждого эндпоинта.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Количество итераций прогрева без замеров.'
+        )
+        parser.add_argument(
+            '--budget', default=DEFAULT_BUDGET,
+            help='JSON-файл бюджета: {"имя": {"queries": {"СУБД": N}, '
+                 '"p95_ms": M}}.'
+        )
+        parser.add_argument(
+            '--write-budget', action='store_true',
+            help='Записать бюджет по результатам замеров вместо проверки.'
+        )
+        parser.add_argument(
+            '--headroom', type=float, default=3.0,
+            help='Множитель p95 при записи бюджета.'
+        )
+        parser.add_argument(
+            '--strict-latency', action='store_true',
+            help='Завершаться с ошибкой и при превышении p95.'
+        )
+        parser.add_argument(
+            '--step', action='append', dest='steps',
+            help='Замерить только шаги с этим именем, '
+                 'можно указать несколько раз.'
+        )
+
+    def handle(self, *args, **options):
+        steps = select_steps(options['steps'])
+        vendor = connection.vendor
+        try:
+            budget = load_budget(options['budget'])
+        except FileNotFoundError:
+            if not options['write_budget']:
+                raise CommandError(f'Нет файла бюджета {options["budget"]}.')
+            budget = {}
+        results = self.run(get_dataset_options(options), steps, options)
+        if options['steps']:
+            results = [
+                result for result in results
+                if result.url in options['steps']
+            ]
+        self.report(results, budget, vendor)
+        if options['write_budget']:
+            with open(options['budget'], 'w', encoding='utf-8') as file:
+                json.dump(
+                    make_budget(
+                        results, options['headroom'], vendor, budget
+                    ),
+                    file, ensure_ascii=False, indent=4,
+                )
+                file.write('\n')
+            self.stdout.write(f'Бюджет записан в {options["budget"]}.')
+            return
+        problems = check_budget(results, budget, vendor)
+        slow = check_latency(results, budget)
+        if options['strict_latency']:
+            problems += slow
+        elif slow:
+            self.stdout.write(self.style.WARNING(
+                'Превышен p95 (не ошибка без --strict-latency):\n'
+                + '\n'.join(slow)
+            ))
+        if problems:
+            raise CommandError(
+                'Превышен бюджет:\n' + '\n'.join(problems)
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджет соблюден.'))
+
+    def run(self, dataset, steps, options):
+        self.stdout.write('Создание данных...')
+        with benchmark_database(dataset) as context:
+            return run_steps(
+                context, options['iterations'], options['warmup'], steps
+            )
+
+    def report(self, results, budget, vendor):
+        self.stdout.write(
+            f'{"Эндпоинт":<38}{"p50, мс":>9}{"p95, мс":>9}'
+            f'{"SQL":>5}{"бюджет":>8}{"ошибки":>8}'
+        )
+        for result in results:
+            limit = budget.get(result.url, {}).get('queries', {}).get(
+                vendor, '-'
+            )
+            self.stdout.write(
+                f'{result.url:<38}{result.percentile(50):>9.1f}'
+                f'{result.percentile(95):>9.1f}{result.max_queries:>5}'
+                f'{limit:>8}{result.errors:>8}'
+            )
@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes.renditions import (
+    build_renditions,
+    needs_renditions,
+    renditions_failed,
+)
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных копий картинок существующих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить копии, даже если они актуальны.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество потоков обработки.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = [
+            recipe for recipe in Recipe.objects.exclude(image='').only(
+                'id', 'image', 'image_renditions'
+            ).iterator()
+            if options['force'] or needs_renditions(recipe)
+            or renditions_failed(recipe)
+        ]
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for recipe, error in zip(
+                recipes, executor.map(self.build, recipes)
+            ):
+                if error is None:
+                    built += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии построены для рецептов: {built}, ошибок: {failed}.'
+        ))
+
+    @staticmethod
+    def build(recipe):
+        try:
+            build_renditions(recipe)
+        except Exception as error:
+            return error
+        finally:
+            connection.close()
+        return None
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.dataset import add_dataset_arguments, get_dataset_options
+from api.endpoint_benchmark import benchmark_database, select_steps
+from api.query_plans import check_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка планов SQL-запросов всех эндпоинтов из benchmark_endpoints '
+        'через EXPLAIN в тестовой базе. Завершается с ошибкой, если запрос '
+        'просматривает таблицу целиком. То же проверяет тест '
+        'api.tests.test_query_plans, команда позволяет задать объем данных.'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, users=50, recipes=500, carts=5)
+        parser.add_argument(
+            '--step', action='append', dest='steps',
+            help='Проверить только шаги с этим именем, '
+                 'можно указать несколько раз.'
+        )
+
+    def handle(self, *args, **options):
+        steps = select_steps(options['steps'])
+        problems = []
+        with benchmark_database(get_dataset_options(options)) as context:
+            for step, queries, scans in check_plans(context, steps):
+                if options['steps'] and step.name not in options['steps']:
+                    continue
+                problems.extend(scans)
+                self.stdout.write(
+                    f'{step.name:<38}{len(queries):>4} запросов  '
+                    + (', '.join(sorted({scan.table for scan in scans}))
+                       or 'ok')
+                )
+        if problems:
+            raise CommandError(
+                'Полный просмотр таблиц:\n' + '\n'.join(
+                    f'{scan.step}: {scan.table}\n    {scan.sql}'
+                    for scan in problems
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Запросы используют индексы.'
+        ))
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.recipe_transfer import CHUNK_SIZE, export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка рецептов в JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл выгрузки или "-" для вывода в stdout.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Количество рецептов, читаемых одним запросом.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Дописать файл, начиная с рецепта после последнего '
+                 'выгруженного.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        after_id = 0
+        if path == '-':
+            file = sys.stdout
+        else:
+            if options['resume'] and os.path.exists(path):
+                after_id = self.get_last_id(path)
+            file = open(path, 'a' if after_id else 'w', encoding='utf-8')
+        count = 0
+        try:
+            for recipe in export_recipes(after_id, options['chunk_size']):
+                file.write(json.dumps(recipe, ensure_ascii=False) + '\n')
+                count += 1
+        finally:
+            if file is not sys.stdout:
+                file.close()
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {count}.'
+        ))
+
+    @staticmethod
+    def get_last_id(path):
+        """id последнего полностью записанного рецепта в файле."""
+        with open(path, 'rb+') as file:
+            file.seek(0, os.SEEK_END)
+            end = file.tell()
+            position = end
+            tail = b''
+            while position > 0 and tail.count(b'\n') < 2:
+                step = min(64 * 1024, position)
+                position -= step
+                file.seek(position)
+                tail = file.read(step) + tail
+            lines = tail.split(b'\n')
+            if not tail.endswith(b'\n'):
+                # Недописанная строка отрезается.
+                file.truncate(end - len(lines[-1]))
+            complete = [line for line in lines[:-1] if line.strip()]
+        return json.loads(complete[-1])['id'] if complete else 0
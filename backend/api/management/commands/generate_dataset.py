@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_cache_version, COUNTS_CACHE
+from api.conditional import CATALOG_CACHE
+from api.dataset import (
+    add_dataset_arguments,
+    BATCH_SIZE,
+    generate_dataset,
+    get_dataset_options,
+)
+from api.filters import TAGS_CACHE
+from api.ingredient_index import INGREDIENTS_CACHE
+from api.shopping_list import SHOPPING_LIST_CACHE
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерация синтетических пользователей, рецептов, избранного, '
+        'корзин и подписок с неравномерной популярностью для нагрузочного '
+        'тестирования. Данные добавляются к уже существующим.'
+    )
+
+    def add_arguments(self, parser):
+        add_dataset_arguments(parser, users=100000, recipes=1000000)
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одной пачке.'
+        )
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не пересобирать поисковый индекс рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        self.started = time.monotonic()
+        generate_dataset(
+            get_dataset_options(options), options['batch_size'],
+            progress=self.report_progress,
+        )
+        if not options['skip_search_index']:
+            rebuild_search_index()
+            self.report_progress('search index', None)
+        for name in (
+            COUNTS_CACHE, CATALOG_CACHE, SHOPPING_LIST_CACHE, TAGS_CACHE,
+            INGREDIENTS_CACHE,
+        ):
+            bump_cache_version(name)
+        self.stdout.write(self.style.SUCCESS('Данные созданы.'))
+
+    def report_progress(self, name, count):
+        elapsed = time.monotonic() - self.started
+        rows = '' if count is None else f': {count} строк'
+        self.stdout.write(f'[{elapsed:7.1f} с] {name}{rows}')
@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.cache import bump_cache_version, COUNTS_CACHE
+from api.conditional import CATALOG_CACHE
+from api.filters import TAGS_CACHE
+from api.ingredient_index import INGREDIENTS_CACHE
+from api.recipe_transfer import (
+    CHUNK_SIZE,
+    get_ranges,
+    import_range,
+    TransferResult,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая загрузка рецептов из JSON Lines. Авторы ищутся '
+        'по почте, недостающие теги и ингредиенты создаются. '
+        'Файлы картинок переносятся отдельно, копии картинок '
+        'строит команда build_image_renditions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл выгрузки export_recipes.')
+        parser.add_argument(
+            '--batch-size', type=int, default=CHUNK_SIZE,
+            help='Количество рецептов в одной транзакции.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки для продолжения загрузки.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов, файл делится на диапазоны.'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if workers > 1 and connection.vendor == 'sqlite':
+            self.stderr.write(self.style.WARNING(
+                'SQLite не поддерживает параллельную запись, '
+                'загрузка идет в одном процессе.'
+            ))
+            workers = 1
+        try:
+            ranges = get_ranges(
+                options['path'], workers, options['checkpoint']
+            )
+        except OSError as error:
+            raise CommandError(error)
+        arguments = [
+            (options['path'], start, end, options['checkpoint'],
+             options['batch_size'])
+            for start, end in ranges
+        ]
+        if workers > 1:
+            connection.close()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(import_range, *zip(*arguments)))
+        else:
+            results = [import_range(*item) for item in arguments]
+        result = sum(results, TransferResult())
+        # Справочники и рецепты создаются без сигналов моделей.
+        if result.imported:
+            bump_cache_version(COUNTS_CACHE)
+            bump_cache_version(CATALOG_CACHE)
+        if result.created_tags:
+            bump_cache_version(TAGS_CACHE)
+        if result.created_ingredients:
+            bump_cache_version(INGREDIENTS_CACHE)
+        if result.conflicting_tags:
+            self.stderr.write(self.style.WARNING(
+                'Теги не созданы, их названия заняты тегами с другими '
+                'слагами: ' + ', '.join(sorted(result.conflicting_tags))
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано рецептов: {result.total}, загружено: '
+            f'{result.imported}, без автора: {result.skipped}.'
+        ))
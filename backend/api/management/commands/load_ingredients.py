@@ -1,28 +1,13 @@
-import json
-import os
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
 
+from api.importers import ImportCommand
+from api.ingredient_index import INGREDIENTS_CACHE
 from recipes.models import Ingredient
 
 
-class Command(BaseCommand):
-    help = 'Импорт ингредиентов'
-
-    def handle(self, *args, **kwargs):
-        json_file_path = os.path.join(
-            settings.BASE_DIR, 'data', 'ingredients.json'
-        )
-        try:
-            with open(json_file_path, 'r', encoding='utf-8') as json_file:
-                ingredients = json.load(json_file)
-                for ingredient in ingredients:
-                    Ingredient.objects.create(**ingredient)
-            self.stdout.write(self.style.SUCCESS(
-                'Ингредиенты успешно импортированы!'
-            ))
-        except Exception as error:
-            self.stderr.write(self.style.ERROR(
-                f'Ошибка при импорте ингредиентов: {error}'
-            ))
+class Command(ImportCommand):
+    help = 'Импорт ингредиентов из CSV или JSON'
+    model = Ingredient
+    fields = ('name', 'measurement_unit')
+    default_path = settings.BASE_DIR / 'data' / 'ingredients.csv'
+    cache_names = (INGREDIENTS_CACHE,)
@@ -1,20 +1,13 @@
-import json
-
 from django.conf import settings
-from django.core.management.base import BaseCommand
 
+from api.filters import TAGS_CACHE
+from api.importers import ImportCommand
 from recipes.models import Tag
 
 
-class Command(BaseCommand):
-    help = 'Импорт тегов'
-
-    def handle(self, *args, **kwargs):
-        file_path = settings.BASE_DIR / 'data' / 'tags.json'
-        with open(file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        Tag.objects.bulk_create((
-            Tag(**item) for item in data),
-            ignore_conflicts=True
-        )
-        self.stdout.write(self.style.SUCCESS('Теги успешно загружены!'))
+class Command(ImportCommand):
+    help = 'Импорт тегов из CSV или JSON'
+    model = Tag
+    fields = ('name', 'slug')
+    default_path = settings.BASE_DIR / 'data' / 'tags.json'
+    cache_names = (TAGS_CACHE,)
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from api.cache import bump_cache_version
+from api.shopping_list import SHOPPING_LIST_CACHE
+from recipes.models import RecipeIngredient, ShoppingListIngredient
+from users.models import CustomUser
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Пересборка и проверка сумм ингредиентов в списках покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить таблицу с актуальной агрегацией.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            live = self.get_live_totals()
+            stored = {
+                (item.user_id, item.ingredient_id): item.total_amount
+                for item in ShoppingListIngredient.objects.iterator()
+            }
+            mismatches = {
+                key for key in live.keys() | stored.keys()
+                if live.get(key) != stored.get(key)
+            }
+            for user_id, ingredient_id in sorted(mismatches):
+                self.stderr.write(
+                    f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                    f'в таблице {stored.get((user_id, ingredient_id))}, '
+                    f'ожидается {live.get((user_id, ingredient_id))}'
+                )
+            if mismatches:
+                raise CommandError(f'Расхождений: {len(mismatches)}.')
+            self.stdout.write(self.style.SUCCESS(
+                f'Списки покупок актуальны, строк: {len(stored)}.'
+            ))
+            return
+
+        with transaction.atomic():
+            # Изменения корзин ждут конца пересборки, а суммы считаются
+            # уже после блокировки.
+            ShoppingListIngredient.objects.lock_users(
+                CustomUser.objects.values('pk')
+            )
+            live = self.get_live_totals()
+            ShoppingListIngredient.objects.all().delete()
+            ShoppingListIngredient.objects.bulk_create(
+                (
+                    ShoppingListIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total_amount,
+                    )
+                    for (user_id, ingredient_id), total_amount
+                    in live.items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        bump_cache_version(SHOPPING_LIST_CACHE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны, строк: {len(live)}.'
+        ))
+
+    @staticmethod
+    def get_live_totals():
+        """Суммы ингредиентов по корзинам, посчитанные по рецептам."""
+        totals = (
+            RecipeIngredient.objects
+            .filter(recipe__in_shopping_carts__isnull=False)
+            .values('recipe__in_shopping_carts__user', 'ingredient')
+            .annotate(total_amount=Sum('amount'))
+            .order_by()
+        )
+        return {
+            (item['recipe__in_shopping_carts__user'], item['ingredient']):
+                item['total_amount']
+            for item in totals.iterator()
+        }
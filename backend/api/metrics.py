@@ -0,0 +1,136 @@
+"""
+Метрики запросов: время ответа, количество и время SQL-запросов
+по имени представления.
+
+SQL-запросы учитываются обработчиком из connection.execute_wrappers,
+который добавляется к каждому соединению при его создании. Счетчики
+текущего запроса хранятся в contextvar, поэтому запросы из потоков
+sync_to_async (см. api.async_views) попадают в статистику своего
+HTTP-запроса.
+
+Гистограммы накапливаются в памяти процесса, и /api/metrics/ отдает
+данные того воркера gunicorn, который принял запрос. При нескольких
+воркерах последовательные опросы Prometheus попадают в разные
+процессы, счетчики скачут и не суммируются. Для точных метрик
+запускайте gunicorn с одним воркером или опрашивайте каждый процесс
+отдельно.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from api.response_cache import get_response_cache_stats
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_current_stats = ContextVar('request_stats', default=None)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    sql_time: float = 0.0
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с накопительными корзинами."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def render(self, name, labels):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {total}')
+        return lines
+
+
+HISTOGRAMS = (
+    ('foodgram_request_duration_seconds', 'Время ответа.', TIME_BUCKETS),
+    ('foodgram_request_sql_queries', 'SQL-запросов за запрос.',
+     QUERY_BUCKETS),
+    ('foodgram_request_sql_duration_seconds', 'Время SQL за запрос.',
+     TIME_BUCKETS),
+)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, duration, stats):
+        with self._lock:
+            histograms = self._views.get(view_name)
+            if histograms is None:
+                histograms = self._views[view_name] = [
+                    Histogram(buckets) for _, _, buckets in HISTOGRAMS
+                ]
+            for histogram, value in zip(
+                histograms, (duration, stats.queries, stats.sql_time)
+            ):
+                histogram.observe(value)
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            for index, (name, description, _) in enumerate(HISTOGRAMS):
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view_name, histograms in sorted(self._views.items()):
+                    lines.extend(histograms[index].render(
+                        name, f'view="{view_name}"'
+                    ))
+        for name, value in get_response_cache_stats().items():
+            metric = f'foodgram_response_cache_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def start_request():
+    """Начинает учет SQL-запросов текущего запроса."""
+    stats = RequestStats()
+    return stats, _current_stats.set(stats)
+
+
+def finish_request(token):
+    _current_stats.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обработчик execute_wrapper, считающий SQL-запросы запроса."""
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
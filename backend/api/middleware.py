@@ -0,0 +1,53 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api.metrics import finish_request, registry, start_request
+
+
+class MetricsMiddleware:
+    """
+    Измеряет время ответа и SQL-запросы и добавляет их в заголовок
+    Server-Timing. Работает и под WSGI, и под ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats, token = start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.process_response(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats, token = start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.process_response(request, response, stats, started)
+
+    @staticmethod
+    def process_response(request, response, stats, started):
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        registry.record(
+            match.view_name if match else 'unresolved', duration, stats
+        )
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.1f}, '
+            f'db;dur={stats.sql_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"'
+        )
+        return response
@@ -1,8 +1,156 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from collections import OrderedDict
 
-from .constants import PAGENATION_SIZE
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from api.cache import COUNTS_CACHE, get_cache_version, TABLE_COUNTS_CACHE
+
+from .constants import (
+    COUNT_CACHE_TIMEOUT,
+    COUNT_ESTIMATE_THRESHOLD,
+    MAX_PAGENATION_SIZE,
+    PAGENATION_SIZE,
+)
+
+
+class EstimatedCountPage(Page):
+    """
+    Страница выборки с оценочным количеством объектов. Наличие
+    следующей страницы определяется по лишней прочитанной строке.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, кэширующий количество объектов.
+
+    Ключ кэша строится по SQL отфильтрованного запроса и версиям
+    таблиц, которые в нем участвуют: запись в таблицу сбрасывает
+    только количества запросов к ней. На PostgreSQL для больших
+    выборок используется оценка планировщика; она только выводится
+    в ответе, а страницы проверяются по самим строкам выборки.
+    """
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return len(self.object_list)
+        try:
+            sql, params = self.object_list.order_by().query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        versions = ':'.join(
+            str(get_cache_version(name))
+            for name in self._count_caches(sql)
+        )
+        key = f'count:{versions}:{digest}'
+        cached = cache.get(key)
+        if cached is None:
+            # Количество хранится до следующего изменения данных, поэтому
+            # считается по основной базе, а не по отстающей реплике.
+            primary = self.object_list.using(DEFAULT_DB_ALIAS)
+            cached = self._estimate_count(primary, sql, params)
+            if cached is None:
+                cached = (primary.count(), True)
+            cache.set(key, cached, COUNT_CACHE_TIMEOUT)
+        count, self.count_is_exact = cached
+        return count
+
+    def validate_number(self, number):
+        if self._has_exact_count():
+            return super().validate_number(number)
+        # Оценка может быть меньше реального количества: существование
+        # страницы проверяется в page().
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не является целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        if self._has_exact_count():
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('Страница не содержит результатов')
+        return EstimatedCountPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page,
+        )
+
+    def _has_exact_count(self):
+        # Признак точности заполняется при вычислении количества.
+        return self.count is not None and self.count_is_exact
+
+    def _count_caches(self, sql):
+        """Общая версия количеств и версии таблиц из запроса."""
+        quote_name = connections[DEFAULT_DB_ALIAS].ops.quote_name
+        return [COUNTS_CACHE] + [
+            TABLE_COUNTS_CACHE.format(model._meta.db_table)
+            for model in apps.get_models(include_auto_created=True)
+            if quote_name(model._meta.db_table) in sql
+        ]
+
+    @staticmethod
+    def _estimate_count(queryset, sql, params):
+        """Оценка количества строк по плану запроса PostgreSQL."""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate < COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return estimate, False
 
 
 class PageLimitPaginator(PageNumberPagination):
+    django_paginator_class = CachedCountPaginator
+    page_size = PAGENATION_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGENATION_SIZE
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_is_exact', self.page.paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """
+    Курсорная пагинация рецептов по (pub_date, id).
+
+    Не выполняет COUNT(*) и не использует OFFSET, поэтому глубокие
+    страницы отдаются так же быстро, как первая.
+    """
     page_size = PAGENATION_SIZE
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGENATION_SIZE
+    ordering = ('-pub_date', '-id')
@@ -0,0 +1,16 @@
+from rest_framework.parsers import FileUploadParser
+
+
+class ImageUploadParser(FileUploadParser):
+    """
+    Картинка в теле запроса с Content-Type image/*.
+    Имя файла необязательно: без Content-Disposition берется
+    расширение из типа содержимого.
+    """
+    media_type = 'image/*'
+
+    def get_filename(self, stream, media_type, parser_context):
+        filename = super().get_filename(stream, media_type, parser_context)
+        if filename:
+            return filename
+        return 'upload.' + media_type.split(';')[0].split('/')[-1].strip()
@@ -0,0 +1,147 @@
+"""
+Проверка планов SQL-запросов горячих эндпоинтов.
+
+Запросы шагов api.endpoint_benchmark перехватываются вместе
+с параметрами и передаются в EXPLAIN. Проверку выполняет тест
+api.tests.test_query_plans, на больших данных - команда
+check_query_plans. Полный просмотр таблицы
+считается ошибкой, если таблица не указана в ALLOWED_SCANS, а запрос -
+в ALLOWED_QUERIES.
+На PostgreSQL перед EXPLAIN выключаются Seq Scan, Hash Join и Merge
+Join: на маленькой тестовой базе планировщик выбирает их и при наличии
+индекса, а так полный просмотр остается в плане, только если
+подходящего индекса нет.
+"""
+import json
+import re
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+
+from api.endpoint_benchmark import iterate_steps
+from api.ingredient_index import index_rows
+
+# Таблицы, которые эндпоинты читают целиком намеренно.
+ALLOWED_SCANS = {
+    # Справочник из нескольких записей, отдается целиком.
+    'recipes_tag',
+}
+# Запросы, которые читают таблицу целиком намеренно.
+ALLOWED_QUERIES = (
+    # Индекс названий в памяти (api.ingredient_index) читает все строки.
+    index_rows,
+)
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+DISABLED_PLAN_NODES = ('enable_seqscan', 'enable_hashjoin', 'enable_mergejoin')
+# Узлы, которые отдают строки потомка по порядку, не читая их все.
+LIMIT_PASS_THROUGH = {'Nested Loop', 'Result', 'Subquery Scan'}
+SUBPLANS = {'SubPlan', 'InitPlan'}
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?$')
+SQL_ALIAS = re.compile(r'"(\w+)" (?:AS )?"?([A-Z]\d+)"?\b')
+
+
+@dataclass
+class FullScan:
+    step: str
+    table: str
+    sql: str
+
+
+def explain(sql, params):
+    """Таблицы, которые план запроса просматривает целиком."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            return set(_postgres_scans(_postgres_plan(cursor, sql, params)))
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            aliases = dict(
+                (alias, table) for table, alias in SQL_ALIAS.findall(sql)
+            )
+            scans = set()
+            for *_, detail in cursor.fetchall():
+                match = SQLITE_SCAN.match(detail)
+                if match:
+                    scans.add(aliases.get(match[1], match[1]))
+            return scans
+    return set()
+
+
+def uses_index(sql, params, index):
+    """План запроса читает индекс index."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            plan = _postgres_plan(cursor, sql, params)
+            return index in _postgres_indexes(plan)
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return any(
+            re.search(rf'\bINDEX {index}\b', detail)
+            for *_, detail in cursor.fetchall()
+        )
+
+
+def _postgres_plan(cursor, sql, params):
+    for setting in DISABLED_PLAN_NODES:
+        cursor.execute(f'SET LOCAL {setting} = off')
+    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']
+
+
+def _postgres_indexes(node):
+    if 'Index Name' in node:
+        yield node['Index Name']
+    for child in node.get('Plans', ()):
+        yield from _postgres_indexes(child)
+
+
+def _postgres_scans(node, limited=False):
+    """
+    Seq Scan и Index Scan без условия по индексу: при выключенном
+    enable_seqscan планировщик заменяет полный просмотр таблицы полным
+    обходом индекса первичного ключа. Обход без условия допустим,
+    только если его строки прямо ограничивает LIMIT (упорядоченный
+    индекс читается до нужного числа строк).
+    """
+    kind = node['Node Type']
+    if kind == 'Seq Scan' or (
+        kind == 'Index Scan' and 'Index Cond' not in node and not limited
+    ):
+        yield node['Relation Name']
+    limited = kind == 'Limit' or (limited and kind in LIMIT_PASS_THROUGH)
+    for child in node.get('Plans', ()):
+        yield from _postgres_scans(
+            child,
+            limited and child.get('Parent Relationship') not in SUBPLANS,
+        )
+
+
+def find_full_scans(step, queries, tables):
+    """
+    Полные просмотры таблиц базы в запросах шага. Подзапросы
+    и производные таблицы (в tables их нет) не учитываются.
+    """
+    allowed = {
+        queryset().query.sql_with_params()[0] for queryset in ALLOWED_QUERIES
+    }
+    found = []
+    for sql, params in queries:
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        if sql in allowed:
+            continue
+        for table in sorted(explain(sql, params)):
+            if table in tables and table not in ALLOWED_SCANS:
+                found.append(FullScan(step.name, table, sql))
+    return found
+
+
+def check_plans(context, steps):
+    """
+    Выполняет шаги один раз и для каждого возвращает шаг,
+    его запросы и найденные полные просмотры таблиц.
+    """
+    tables = set(connection.introspection.table_names())
+    for _, step, _, _, queries in iterate_steps(context, 1, steps):
+        yield step, queries, find_full_scans(step, queries, tables)
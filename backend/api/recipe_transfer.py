@@ -0,0 +1,325 @@
+"""
+Перенос каталога рецептов между окружениями в формате JSON Lines.
+
+Одна строка файла - один рецепт. Автор, теги и ингредиенты записываются
+естественными ключами (почта, слаг, название с единицей измерения),
+а не id, поэтому файл можно загрузить в базу с другими первичными
+ключами. Картинки не копируются: в файле хранится путь в MEDIA_ROOT.
+"""
+import json
+import os
+import secrets
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from recipes.models import (
+    Ingredient,
+    make_short_id,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+)
+from recipes.search import update_search_index
+from users.models import CustomUser
+
+CHUNK_SIZE = 1000
+RECIPE_FIELDS = (
+    'id', 'author__email', 'name', 'text', 'image', 'image_renditions',
+    'cooking_time', 'pub_date',
+)
+
+
+@dataclass
+class TransferResult:
+    total: int = 0
+    imported: int = 0
+    skipped: int = 0
+    created_tags: int = 0
+    created_ingredients: int = 0
+    # Слаги тегов, название которых уже занято тегом с другим слагом.
+    conflicting_tags: set = field(default_factory=set)
+
+    def __add__(self, other):
+        return TransferResult(
+            self.total + other.total,
+            self.imported + other.imported,
+            self.skipped + other.skipped,
+            self.created_tags + other.created_tags,
+            self.created_ingredients + other.created_ingredients,
+            self.conflicting_tags | other.conflicting_tags,
+        )
+
+
+def export_recipes(after_id=0, chunk_size=CHUNK_SIZE):
+    """
+    Рецепты в порядке id, начиная после after_id. Читаются порциями
+    по ключу, связи каждой порции загружаются двумя запросами.
+    """
+    while True:
+        recipes = list(
+            Recipe.objects.filter(id__gt=after_id).order_by('id')
+            .values(*RECIPE_FIELDS)[:chunk_size]
+        )
+        if not recipes:
+            return
+        ids = [recipe['id'] for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, slug, name in Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).values_list('recipe_id', 'tag__slug', 'tag__name').iterator():
+            tags[recipe_id].append({'slug': slug, 'name': name})
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).values_list(
+            'recipe_id', 'ingredient__name', 'ingredient__measurement_unit',
+            'amount'
+        ).iterator():
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount
+            })
+        for recipe in recipes:
+            yield {
+                'id': recipe['id'],
+                'author': recipe['author__email'],
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'image': recipe['image'],
+                'image_renditions': recipe['image_renditions'],
+                'cooking_time': recipe['cooking_time'],
+                'pub_date': recipe['pub_date'].isoformat(),
+                'tags': tags[recipe['id']],
+                'ingredients': ingredients[recipe['id']],
+            }
+        after_id = ids[-1]
+
+
+def split_ranges(path, parts):
+    """Делит файл на диапазоны байтов по границам строк."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as file:
+        for part in range(1, parts):
+            file.seek(max(size * part // parts, bounds[-1]))
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [
+        (start, end) for start, end in zip(bounds, bounds[1:]) if start < end
+    ]
+
+
+def get_ranges(path, parts, checkpoint_path=None):
+    """
+    Диапазоны файла для загрузки. При наличии контрольной точки
+    используется сохраненное в ней разбиение, чтобы продолжить
+    загрузку с другим числом процессов.
+    """
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, encoding='utf-8') as file:
+            return [tuple(bounds) for bounds in json.load(file)]
+    ranges = split_ranges(path, parts)
+    if checkpoint_path:
+        _write_atomic(checkpoint_path, ranges)
+    return ranges
+
+
+def _read_position(checkpoint_path, start):
+    """
+    Позиция, с которой продолжается загрузка диапазона. Контрольная
+    точка пишется до фиксации транзакции пачки, поэтому пачка считается
+    загруженной, только если в базе есть ее последний рецепт.
+    """
+    path = f'{checkpoint_path}.{start}'
+    if not os.path.exists(path):
+        return start
+    with open(path, encoding='utf-8') as file:
+        checkpoint = json.load(file)
+    recipe = checkpoint['recipe']
+    if recipe and not Recipe.objects.filter(
+        id=recipe['id'], name=recipe['name']
+    ).exists():
+        return checkpoint['previous']
+    return checkpoint['position']
+
+
+def _write_atomic(path, data):
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+def import_range(path, start, end, checkpoint_path=None,
+                 batch_size=CHUNK_SIZE):
+    """
+    Загружает рецепты из диапазона байтов файла пачками.
+    Позиция после пачки сохраняется в контрольной точке в транзакции
+    пачки, повторный запуск продолжает с нее.
+    """
+    connection.close()
+    result = TransferResult()
+    position = start
+    if checkpoint_path:
+        position = _read_position(checkpoint_path, start)
+    with open(path, 'rb') as file:
+        file.seek(position)
+        batch = []
+        while file.tell() < end:
+            line = file.readline()
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= batch_size or file.tell() >= end:
+                checkpoint = None
+                if checkpoint_path:
+                    checkpoint = (
+                        f'{checkpoint_path}.{start}', position, file.tell()
+                    )
+                result += import_batch(batch, checkpoint)
+                position = file.tell()
+                batch = []
+    connection.close()
+    return result
+
+
+@transaction.atomic
+def import_batch(items, checkpoint=None):
+    """
+    Создает рецепты пачки со связями, возвращает счетчики.
+    checkpoint - (путь, позиция пачки, позиция после нее): контрольная
+    точка записывается перед фиксацией транзакции.
+    """
+    result = TransferResult(total=len(items))
+    recipes = _create_recipes(items, result)
+    if checkpoint:
+        path, previous, position = checkpoint
+        _write_atomic(path, {
+            'previous': previous,
+            'position': position,
+            'recipe': {
+                'id': recipes[-1].pk, 'name': recipes[-1].name
+            } if recipes else None,
+        })
+    return result
+
+
+def _create_recipes(items, result):
+    if not items:
+        return []
+    authors = dict(CustomUser.objects.filter(
+        email__in={item['author'] for item in items}
+    ).values_list('email', 'id'))
+    items = [item for item in items if item['author'] in authors]
+    result.skipped = result.total - len(items)
+    if not items:
+        return []
+    tags = {tag['slug']: tag for item in items for tag in item['tags']}
+    tag_ids, result.created_tags = _get_or_create(
+        Tag, ('slug',), ('name',), tags.values()
+    )
+    result.conflicting_tags = set(tags) - set(tag_ids)
+    ingredient_ids, result.created_ingredients = _get_or_create(
+        Ingredient, ('name', 'measurement_unit'), (),
+        (ingredient for item in items for ingredient in item['ingredients'])
+    )
+
+    recipes = [
+        Recipe(
+            author_id=authors[item['author']],
+            name=item['name'],
+            text=item['text'],
+            image=item['image'],
+            image_renditions=item.get('image_renditions') or {},
+            cooking_time=item['cooking_time'],
+            # Временный id, отличимый от настоящих: в алфавите нет '~'.
+            short_id='~' + secrets.token_urlsafe(6)[:7],
+        )
+        for item in items
+    ]
+    Recipe.objects.bulk_create(recipes)
+    if recipes[0].pk is None:
+        # Без RETURNING (SQLite) id находятся по временным short_id.
+        pks = dict(Recipe.objects.filter(
+            short_id__in=[recipe.short_id for recipe in recipes]
+        ).values_list('short_id', 'id'))
+        for recipe in recipes:
+            recipe.pk = recipe.id = pks[recipe.short_id]
+    ids = [recipe.pk for recipe in recipes]
+    # auto_now_add перезаписывает pub_date при вставке, поэтому дата
+    # публикации и постоянный short_id выставляются отдельным UPDATE.
+    Recipe.objects.filter(id__in=ids).update(
+        pub_date=Case(
+            *(When(id=recipe.pk, then=Value(parse_datetime(item['pub_date'])))
+              for recipe, item in zip(recipes, items)),
+            output_field=DateTimeField(),
+        ),
+        short_id=Case(
+            *(When(id=pk, then=Value(make_short_id(pk))) for pk in ids),
+        ),
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_ids[tag['slug']])
+        for recipe, item in zip(recipes, items)
+        for tag in item['tags']
+        # Тег с тем же названием, но другим слагом не создается,
+        # его слаг попадает в result.conflicting_tags.
+        if tag['slug'] in tag_ids
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe.pk,
+            ingredient_id=ingredient_ids[
+                ingredient['name'], ingredient['measurement_unit']
+            ],
+            amount=ingredient['amount'],
+        )
+        for recipe, item in zip(recipes, items)
+        for ingredient in item['ingredients']
+    )
+    update_search_index(ids)
+    result.imported = len(recipes)
+    return recipes
+
+
+def _get_or_create(model, key_fields, extra_fields, rows):
+    """
+    Создает недостающие объекты справочника. Возвращает id объектов
+    по ключу и количество созданных. Объекты, которые не удалось
+    создать из-за других уникальных полей, в результат не попадают.
+    """
+    rows = {
+        tuple(row[name] for name in key_fields): row for row in rows
+    }
+    if not rows:
+        return {}, 0
+    existing = _get_ids(model, key_fields, rows)
+    missing = [row for key, row in rows.items() if key not in existing]
+    if not missing:
+        return _by_key(existing, key_fields), 0
+    model.objects.bulk_create(
+        (model(**{name: row[name] for name in key_fields + extra_fields})
+         for row in missing),
+        ignore_conflicts=True,
+    )
+    ids = _get_ids(model, key_fields, rows)
+    return _by_key(ids, key_fields), len(ids) - len(existing)
+
+
+def _get_ids(model, key_fields, rows):
+    lookup = model.objects.filter(
+        **{f'{key_fields[0]}__in': {key[0] for key in rows}}
+    ).values_list(*key_fields, 'id')
+    return {
+        tuple(values[:-1]): values[-1] for values in lookup
+        if tuple(values[:-1]) in rows
+    }
+
+
+def _by_key(ids, key_fields):
+    if len(key_fields) == 1:
+        return {key[0]: value for key, value in ids.items()}
+    return ids
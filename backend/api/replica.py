@@ -0,0 +1,105 @@
+"""
+Чтение с реплики базы данных.
+
+Если в DATABASES есть псевдоним replica, безопасные запросы
+к вьюсетам api.views читают с реплики, все записи идут в default.
+Реплика отстает от основной базы, поэтому пользователь, который
+недавно что-то изменил, читает с основной базы в течение
+REPLICA_STICKY_SECONDS после успешного изменяющего запроса.
+Остальные пользователи продолжают читать с реплики, а общие кэши
+не заполняются данными, которые могли отстать от версии кэша:
+- словарь тегов и индекс ингредиентов строятся по основной базе;
+- ответ, прочитанный с реплики, пока версия каталога моложе окна,
+  не попадает в кэш ответов и не получает ETag списка (catalog_may_lag).
+Количество объектов для пагинации (api.pagination) всегда считается
+по основной базе: оно кэшируется по версиям таблиц, которые
+меняются слишком часто, чтобы ждать по ней реплику.
+"""
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+from api.cache import get_cache_version
+from api.conditional import CATALOG_CACHE
+
+DEFAULT = 'default'
+REPLICA = 'replica'
+PINNED_KEY = 'replica:pinned:{}'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    """Чтение с реплики внутри ReplicaReadMixin, остальное - с default."""
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if _use_replica.get() else DEFAULT
+
+    def db_for_write(self, model, **hints):
+        # Без явного ответа Django записал бы объект, прочитанный
+        # с реплики, обратно в реплику.
+        return DEFAULT
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT, REPLICA}
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики переносит репликация, а не migrate.
+        return db == DEFAULT
+
+
+def pin_to_primary(user):
+    """Пользователь читает с основной базы в течение окна."""
+    cache.set(
+        PINNED_KEY.format(user.pk), True, settings.REPLICA_STICKY_SECONDS
+    )
+
+
+def can_use_replica(request):
+    if REPLICA not in settings.DATABASES:
+        return False
+    if request.method not in SAFE_METHODS:
+        return False
+    if not request.user.is_authenticated:
+        return True
+    return not cache.get(PINNED_KEY.format(request.user.pk))
+
+
+def catalog_may_lag():
+    """
+    Запрос читает с реплики, а каталог изменился меньше окна назад:
+    реплика могла еще не получить изменение. Версии кэша - время
+    изменения в миллисекундах (api.cache).
+    """
+    if not _use_replica.get():
+        return False
+    fresh_after = (time.time() - settings.REPLICA_STICKY_SECONDS) * 1000
+    return get_cache_version(CATALOG_CACHE) >= fresh_after
+
+
+class ReplicaReadMixin:
+    """
+    Вьюсет читает безопасные запросы с реплики, а после успешного
+    изменяющего запроса закрепляет пользователя за основной базой.
+    Решение принимается после аутентификации, поэтому пользователь
+    и токен всегда читаются с основной базы.
+    """
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if can_use_replica(request):
+            self._replica_token = _use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            _use_replica.reset(self._replica_token)
+            self._replica_token = None
+        elif (request.method not in SAFE_METHODS
+                and response.status_code < 400
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,55 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+from api.cache import get_cache_version
+from api.conditional import CATALOG_CACHE
+from api.constants import RESPONSE_CACHE_TIMEOUT
+
+HITS_KEY = 'response_cache:hits'
+MISSES_KEY = 'response_cache:misses'
+
+
+def get_response_cache_key(request):
+    """
+    Ключ кэша ответа по пути и отсортированным параметрам запроса.
+
+    В ключ входит версия каталога: запись рецепта, тега или
+    ингредиента меняет версию, и все старые ключи перестают читаться.
+    """
+    params = urlencode(sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    ))
+    digest = hashlib.md5(
+        f'{request.get_host()}{request.path}?{params}'.encode()
+    ).hexdigest()
+    return f'response:{get_cache_version(CATALOG_CACHE)}:{digest}'
+
+
+def get_cached_data(key):
+    data = cache.get(key)
+    _increment(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def set_cached_data(key, data):
+    cache.set(key, data, RESPONSE_CACHE_TIMEOUT)
+
+
+def get_response_cache_stats():
+    """Количество попаданий и промахов кэша ответов."""
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
@@ -1,6 +1,13 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.http import QueryDict
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.fields import BulkPrimaryKeyRelatedField, HybridImageField
+from api.shopping_list import refresh_shopping_lists
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
@@ -9,12 +16,53 @@ from recipes.models import (
     ShoppingList,
     Tag,
 )
+from recipes.renditions import (
+    needs_renditions,
+    renditions_queued,
+    schedule_renditions,
+)
+from recipes.search import update_search_index
 from users.models import CustomUser, Follow
 
 
+class ImageSrcsetField(serializers.Field):
+    """
+    Копии картинки рецепта в виде атрибутов srcset, сгруппированных
+    по MIME-типу. Пока копии не построены, возвращается пустой словарь,
+    а построение ставится в очередь: задача могла потеряться
+    при перезапуске процесса. Рецепты, которые уже в очереди или чьи
+    копии не удалось построить, повторно не ставятся.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', 'image_renditions')
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        if needs_renditions(instance) and not renditions_queued(instance.pk):
+            schedule_renditions(instance.pk)
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        srcset = {}
+        for item in value.get('files', ()):
+            url = default_storage.url(item['path'])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            srcset.setdefault(item['type'], []).append(
+                f'{url} {item["width"]}w'
+            )
+        return {
+            content_type: ', '.join(candidates)
+            for content_type, candidates in srcset.items()
+        }
+
+
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор аватара."""
-    avatar = Base64ImageField()
+    avatar = HybridImageField()
 
     class Meta:
         model = CustomUser
@@ -54,11 +102,27 @@ class UserSerializer(serializers.ModelSerializer):
         Определяет, подписан ли текущий пользователь на данного пользователя.
         """
         request = self.context.get('request')
-        return bool(
-            request and request.user.is_authenticated
-            and Follow.objects.filter(user=request.user,
-                                      author=user).exists()
-        )
+        if not (request and request.user.is_authenticated):
+            return False
+        if user.pk == request.user.pk:
+            return False
+        return user.pk in self.get_subscribed_ids(request)
+
+    @staticmethod
+    def get_subscribed_ids(request):
+        """
+        Множество id авторов, на которых подписан текущий пользователь.
+
+        Загружается одним запросом и сохраняется в объекте запроса,
+        поэтому общее для всех сериализаторов в ответе.
+        """
+        subscribed_ids = getattr(request, '_subscribed_ids', None)
+        if subscribed_ids is None:
+            subscribed_ids = set(Follow.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True))
+            request._subscribed_ids = subscribed_ids
+        return subscribed_ids
 
 
 class FollowerCreateSerializer(serializers.ModelSerializer):
@@ -103,23 +167,30 @@ class FollowerRetrieveSerializer(UserSerializer):
             'recipes'
         )
 
+    @staticmethod
+    def get_recipes_limit(request):
+        """Получение лимита рецептов из параметров запроса."""
+        try:
+            recipes_limit = int(request.query_params.get('recipes_limit'))
+        except (ValueError, TypeError):
+            return None
+        return recipes_limit if recipes_limit > 0 else None
+
     def get_recipes_count(self, obj):
         """Подсчет общего количества рецептов пользователя."""
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
         """Получение списка рецептов автора с учетом лимита."""
-        queryset = Recipe.objects.filter(author=obj)
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-
-        try:
+        if hasattr(obj, 'limited_recipes'):
+            queryset = obj.limited_recipes
+        else:
+            queryset = Recipe.objects.filter(author=obj)
+            recipes_limit = self.get_recipes_limit(self.context['request'])
             if recipes_limit is not None:
-                recipes_limit = int(recipes_limit)
-                if recipes_limit > 0:
-                    queryset = queryset[:recipes_limit]
-        except (ValueError, TypeError):
-            pass
+                queryset = queryset[:recipes_limit]
 
         return RecipeListSerializer(queryset, many=True,
                                     context=self.context).data
@@ -143,8 +214,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientCreateSerializer(serializers.ModelSerializer):
-    """Серилизатор для добавления ингридиентов"""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    """
+    Серилизатор для добавления ингридиентов. Ингредиенты по id
+    загружает RecipeSerializer одним запросом на весь рецепт.
+    """
+    id = BulkPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
 
     class Meta:
         model = RecipeIngredient
@@ -153,10 +227,21 @@ class IngredientCreateSerializer(serializers.ModelSerializer):
 
 class RecipeListSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения списка рецептов."""
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Ингредиенты рецепта по названию, как в справочнике."""
+
+    def to_representation(self, data):
+        items = data.all() if isinstance(data, models.Manager) else data
+        return super().to_representation(sorted(
+            items, key=lambda item: (item.ingredient.name, item.ingredient_id)
+        ))
 
 
 class RecipeAmountIngredientSerializer(serializers.ModelSerializer):
@@ -173,6 +258,7 @@ class RecipeAmountIngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = RecipeIngredientListSerializer
 
 
 class DetailedRecipeSerializer(serializers.ModelSerializer):
@@ -185,6 +271,7 @@ class DetailedRecipeSerializer(serializers.ModelSerializer):
         many=True,
         source='recipe_ingredients'
     )
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
@@ -197,12 +284,15 @@ class DetailedRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, obj):
         """Проверить, является ли рецепт избранным для пользователя."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
@@ -212,6 +302,8 @@ class DetailedRecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Проверить, есть ли рецепт в списке покупок пользователя."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return bool(
             request and request.user.is_authenticated
@@ -223,10 +315,8 @@ class DetailedRecipeSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
     ingredients = IngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
-    )
-    image = Base64ImageField()
+    tags = BulkPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    image = HybridImageField()
 
     class Meta:
         model = Recipe
@@ -235,6 +325,37 @@ class RecipeSerializer(serializers.ModelSerializer):
             'text', 'image', 'cooking_time',
         )
 
+    def to_internal_value(self, data):
+        """
+        В multipart/form-data ингредиенты передаются JSON-строкой,
+        теги - JSON-строкой или повторяющимся полем.
+        """
+        if isinstance(data, QueryDict):
+            data = self._parse_form_data(data)
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def _parse_form_data(data):
+        parsed = data.dict()
+        tags = data.getlist('tags')
+        if len(tags) == 1 and tags[0].lstrip().startswith('['):
+            tags = tags[0]
+        for field, value in (
+            ('ingredients', data.get('ingredients')), ('tags', tags)
+        ):
+            if field not in data:
+                continue
+            if not isinstance(value, str):
+                parsed[field] = value
+                continue
+            try:
+                parsed[field] = json.loads(value)
+            except ValueError:
+                raise serializers.ValidationError(
+                    {field: 'Ожидается JSON-строка.'}
+                )
+        return parsed
+
     def to_representation(self, instance):
         """Возвращение развернутого представления рецепта."""
         return DetailedRecipeSerializer(instance, context=self.context).data
@@ -272,19 +393,41 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def validate_tags(self, value):
+        """Загрузка тегов одним запросом."""
+        tags, errors = self.fields['tags'].child_relation.load_objects(value)
+        if errors:
+            raise serializers.ValidationError(errors[
+                next(pk for pk in value if pk in errors)
+            ])
+        return [tags[pk] for pk in value]
+
+    def validate_ingredients(self, value):
+        """Загрузка ингредиентов рецепта одним запросом."""
+        ingredients, errors = self.fields['ingredients'].child.fields[
+            'id'
+        ].load_objects([item['id'] for item in value])
+        if errors:
+            raise serializers.ValidationError([
+                {'id': [errors[item['id']]]} if item['id'] in errors else {}
+                for item in value
+            ])
+        for item in value:
+            item['id'] = ingredients[item['id']]
+        return value
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта с ингредиентами и тегами."""
         ingredients = validated_data.pop('ingredients', [])
         tags = validated_data.pop('tags', [])
         validated_data['author'] = self.context['request'].user
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self._create_recipe_ingredients(recipe, ingredients)
-        return recipe
-
-    @staticmethod
-    def _create_recipe_ingredients(recipe, ingredients):
-        """Создание ингредиентов для рецепта."""
+        # Связи нового рецепта вставляются напрямую: версии кэшей уже
+        # сброшены сигналом post_save рецепта.
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        )
         recipe_ingredients = [
             RecipeIngredient(
                 recipe=recipe,
@@ -294,19 +437,114 @@ class RecipeSerializer(serializers.ModelSerializer):
             for ingredient in ingredients
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        update_search_index([recipe.id])
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        self._set_prefetched(recipe, tags, recipe_ingredients)
+        return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        """Обновление рецепта с ингредиентами и тегами."""
+        """
+        Обновление рецепта с ингредиентами и тегами. Применяются только
+        отличия от сохраненного состояния, ответ строится из объектов
+        в памяти.
+        """
         ingredients = validated_data.pop('ingredients', None)
-        if ingredients:
-            instance.recipe_ingredients.all().delete()
-            self._create_recipe_ingredients(instance, ingredients)
-
-        if 'tags' in validated_data:
-            tags = validated_data.get('tags')
+        tags = validated_data.pop('tags', None)
+        search_changed = any(
+            field in validated_data
+            and validated_data[field] != getattr(instance, field)
+            for field in ('name', 'text')
+        )
+        recipe_ingredients = list(instance.recipe_ingredients.all())
+        if ingredients is not None:
+            recipe_ingredients, changed_ids, ingredients_changed = (
+                self._update_recipe_ingredients(
+                    instance, recipe_ingredients, ingredients
+                )
+            )
+            if changed_ids:
+                refresh_shopping_lists(instance, changed_ids)
+            search_changed = search_changed or ingredients_changed
+
+        current_tags = list(instance.tags.all())
+        if tags is not None and (
+            {tag.pk for tag in tags} != {tag.pk for tag in current_tags}
+        ):
             instance.tags.set(tags)
+            current_tags = tags
+
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        # Записываются только переданные поля: значения из памяти не
+        # затирают то, что изменили параллельно, например описание копий
+        # картинки от фоновой задачи. Дата изменения обновляется всегда.
+        instance.save(update_fields=[*validated_data, 'modified'])
+        if search_changed:
+            update_search_index([instance.id])
+        self._set_prefetched(instance, current_tags, recipe_ingredients)
+        return instance
+
+    @staticmethod
+    def _update_recipe_ingredients(recipe, recipe_ingredients, ingredients):
+        """
+        Приводит ингредиенты рецепта к новому списку минимальным числом
+        запросов. Возвращает новые строки рецепта, id ингредиентов,
+        чьи суммы в списках покупок изменились, и признак изменения
+        состава.
+        """
+        current = {item.ingredient_id: item for item in recipe_ingredients}
+        incoming = {item['id'].pk: item for item in ingredients}
+        removed = current.keys() - incoming.keys()
+        updated = []
+        created = []
+        for ingredient_id, item in incoming.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                created.append(RecipeIngredient(
+                    recipe=recipe, ingredient=item['id'],
+                    amount=item['amount']
+                ))
+            elif recipe_ingredient.amount != item['amount']:
+                recipe_ingredient.amount = item['amount']
+                updated.append(recipe_ingredient)
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        if updated:
+            RecipeIngredient.objects.bulk_update(updated, ['amount'])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        kept = [
+            item for ingredient_id, item in current.items()
+            if ingredient_id not in removed
+        ]
+        changed_ids = removed | {
+            item.ingredient_id for item in updated + created
+        }
+        return kept + created, changed_ids, bool(removed or created)
 
-        return super().update(instance, validated_data)
+    @staticmethod
+    def _set_prefetched(recipe, tags, recipe_ingredients):
+        """
+        Кладет теги и ингредиенты в кэш prefetch_related, чтобы
+        сериализация ответа не обращалась к базе.
+        """
+        cache = getattr(recipe, '_prefetched_objects_cache', {})
+        recipe._prefetched_objects_cache = cache
+        for name, objects in (
+            ('tags', sorted(tags, key=lambda tag: tag.pk)),
+            ('recipe_ingredients', sorted(
+                recipe_ingredients,
+                key=lambda item: (item.ingredient.name, item.ingredient_id)
+            )),
+        ):
+            cache.pop(name, None)
+            queryset = getattr(recipe, name).all()
+            queryset._result_cache = objects
+            queryset._prefetch_done = True
+            cache[name] = queryset
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
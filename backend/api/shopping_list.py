@@ -0,0 +1,140 @@
+import csv
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api.cache import bump_cache_version, get_cache_version
+from api.constants import (
+    SHOPPING_LIST_CACHE_MAX_SIZE,
+    SHOPPING_LIST_CACHE_TIMEOUT,
+)
+from recipes.models import ShoppingListIngredient
+
+SHOPPING_LIST_CACHE = 'shopping_list'
+
+
+class Echo:
+    """Объект-заглушка для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list_rows(user):
+    """
+    Суммарное количество ингредиентов рецептов корзины.
+
+    Суммы читаются из ShoppingListIngredient серверным курсором
+    и упорядочены по названию ингредиента.
+    """
+    return (
+        ShoppingListIngredient.objects.filter(user=user)
+        .values(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        )
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+        .iterator()
+    )
+
+
+def refresh_shopping_lists(recipe, ingredient_ids):
+    """Пересчитывает списки покупок после изменения ингредиентов рецепта."""
+    ShoppingListIngredient.objects.refresh_for_recipe(recipe, ingredient_ids)
+    bump_cache_version(SHOPPING_LIST_CACHE)
+
+
+def render_txt(rows):
+    for item in rows:
+        yield (
+            f'{item["ingredient__name"]}'
+            f'({item["ingredient__measurement_unit"]}) - '
+            f'{item["total_amount"]}\n'
+        ).encode()
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(
+        ('Ингредиент', 'Единица измерения', 'Количество')
+    ).encode()
+    for item in rows:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount'],
+        )).encode()
+
+
+def render_pdf(rows):
+    """
+    PDF собирается в памяти целиком и отдается одной частью, в отличие
+    от txt и csv, поэтому память растет с размером списка.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font_name = 'Helvetica'
+    if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        font_name = 'ShoppingListFont'
+        pdfmetrics.registerFont(
+            TTFont(font_name, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    margin, line_height = 50, 18
+    y = height - margin
+    pdf.setFont(font_name, 16)
+    pdf.drawString(margin, y, 'Список покупок')
+    y -= line_height * 2
+    pdf.setFont(font_name, 12)
+    for line in render_txt(rows):
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font_name, 12)
+            y = height - margin
+        pdf.drawString(margin, y, line.decode().rstrip('\n'))
+        y -= line_height
+    pdf.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'pdf': ('application/pdf', render_pdf),
+}
+
+
+def get_cache_key(recipe_ids, file_format):
+    """Ключ кэша по дайджесту содержимого корзины."""
+    digest = hashlib.sha256(
+        ','.join(map(str, sorted(recipe_ids))).encode()
+    ).hexdigest()
+    version = get_cache_version(SHOPPING_LIST_CACHE)
+    return f'shopping_list:{version}:{file_format}:{digest}'
+
+
+def cache_stream(chunks, key, max_size=SHOPPING_LIST_CACHE_MAX_SIZE):
+    """
+    Отдает части файла и кэширует файл после полной отдачи. Части
+    копятся, только пока файл меньше max_size: большой список
+    отдается без буфера и не кэшируется.
+    """
+    content = []
+    size = 0
+    for chunk in chunks:
+        if content is not None:
+            size += len(chunk)
+            if size > max_size:
+                content = None
+            else:
+                content.append(chunk)
+        yield chunk
+    if content is not None:
+        cache.set(key, b''.join(content), SHOPPING_LIST_CACHE_TIMEOUT)
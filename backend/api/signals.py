@@ -0,0 +1,221 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from api.authentication import invalidate_cached_user
+from api.cache import bump_cache_version, TABLE_COUNTS_CACHE
+from api.conditional import CATALOG_CACHE, PERSONAL_CACHE
+from api.filters import TAGS_CACHE
+from api.ingredient_index import INGREDIENTS_CACHE
+from api.metrics import install_query_recorder
+from api.shopping_list import SHOPPING_LIST_CACHE
+from api.utils import SHORT_LINKS_CACHE
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    ShoppingListIngredient,
+    Tag,
+)
+from recipes.renditions import (
+    delete_renditions,
+    needs_renditions,
+    schedule_renditions,
+)
+from recipes.search import remove_from_search_index, update_search_index
+from users.models import CustomUser, Follow
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=CustomUser)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_counts(sender, **kwargs):
+    """Сбрасывает закэшированные количества запросов к таблице."""
+    bump_cache_version(TABLE_COUNTS_CACHE.format(sender._meta.db_table))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_counts(sender, created, **kwargs):
+    """Новый пользователь меняет количество в списке пользователей."""
+    if created:
+        invalidate_counts(sender)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_auth_user(sender, instance, **kwargs):
+    """Сбрасывает строку пользователя, закэшированную при аутентификации."""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_shopping_lists(sender, **kwargs):
+    """Сбрасывает закэшированные файлы списков покупок."""
+    bump_cache_version(SHOPPING_LIST_CACHE)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    """Перестраивает индекс ингредиентов во всех воркерах."""
+    bump_cache_version(INGREDIENTS_CACHE)
+
+
+@receiver(post_save, sender=ShoppingList)
+def add_to_shopping_list_totals(sender, instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок пользователя."""
+    if created:
+        ShoppingListIngredient.objects.refresh(
+            [instance.user_id],
+            RecipeIngredient.objects.filter(
+                recipe_id=instance.recipe_id
+            ).values('ingredient'),
+        )
+
+
+@receiver(pre_delete, sender=ShoppingList)
+def remember_shopping_list_ingredients(sender, instance, **kwargs):
+    """
+    Запоминает ингредиенты рецепта до удаления: при каскадном удалении
+    рецепта они могут быть удалены раньше записи корзины.
+    """
+    instance.ingredient_ids = list(RecipeIngredient.objects.filter(
+        recipe_id=instance.recipe_id
+    ).values_list('ingredient_id', flat=True))
+
+
+@receiver(post_delete, sender=ShoppingList)
+def remove_from_shopping_list_totals(sender, instance, **kwargs):
+    """Вычитает ингредиенты рецепта из списка покупок пользователя."""
+    ShoppingListIngredient.objects.refresh(
+        [instance.user_id], getattr(instance, 'ingredient_ids', [])
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_search(sender, instance, **kwargs):
+    """Удаляет документ рецепта из поискового индекса."""
+    remove_from_search_index([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_short_links(sender, **kwargs):
+    """Сбрасывает кэш коротких ссылок на удаленные рецепты."""
+    bump_cache_version(SHORT_LINKS_CACHE)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Обновляет поиск по рецептам с переименованным ингредиентом."""
+    if not created:
+        update_search_index(
+            instance.recipes.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_ids(sender, **kwargs):
+    """Сбрасывает закэшированный словарь слагов тегов."""
+    bump_cache_version(TAGS_CACHE)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalog(sender, **kwargs):
+    """Меняет версию каталога рецептов."""
+    bump_cache_version(CATALOG_CACHE)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def touch_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Изменение тегов рецепта меняет дату его изменения."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        Recipe.touch(tags=instance)
+        if pk_set:
+            Recipe.touch(pk__in=pk_set)
+    else:
+        Recipe.touch(pk=instance.pk)
+    bump_cache_version(CATALOG_CACHE)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def touch_tag_recipes(sender, instance, created=False, **kwargs):
+    """Переименование или удаление тега меняет его рецепты."""
+    if not created:
+        Recipe.touch(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created=False, **kwargs):
+    """Переименование или удаление ингредиента меняет его рецепты."""
+    if not created:
+        Recipe.touch(ingredients=instance)
+
+
+@receiver(post_save, sender=CustomUser)
+def touch_author_recipes(sender, instance, created, update_fields,
+                         **kwargs):
+    """Изменение профиля автора меняет его рецепты."""
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    Recipe.touch(author=instance)
+    bump_cache_version(CATALOG_CACHE)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_personal(sender, instance, **kwargs):
+    """Меняет версию персональных флагов пользователя."""
+    bump_cache_version(PERSONAL_CACHE.format(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def build_image_renditions(sender, instance, **kwargs):
+    """Строит копии новой картинки рецепта в фоне."""
+    if needs_renditions(instance):
+        schedule_renditions(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_renditions(sender, instance, **kwargs):
+    """Удаляет копии картинки удаленного рецепта."""
+    files = instance.image_renditions.get('files', ())
+    if files:
+        transaction.on_commit(
+            lambda: delete_renditions(instance.image.storage, files)
+        )
+
+
+@receiver(connection_created)
+def record_queries(sender, connection, **kwargs):
+    """Подключает учет SQL-запросов для метрик к новому соединению."""
+    install_query_recorder(connection)
@@ -0,0 +1,80 @@
+import asyncio
+import gc
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import SimpleTestCase
+from django.urls import resolve
+
+from asgiref.sync import sync_to_async
+from foodgram_backend import asgi_settings
+
+from api import async_views
+from api.utils import redirect_to_recipe_view
+
+
+def connection_view(request):
+    connection.ensure_connection()
+    response = HttpResponse()
+    response.thread = threading.get_ident()
+    response.connection = connection.connection
+    return response
+
+
+class AsyncReadViewTest(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        # Свой пул: после теста его потоки завершаются.
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        patcher = mock.patch.object(
+            async_views, '_call_view_in_pool', sync_to_async(
+                async_views._call_view, thread_sensitive=False,
+                executor=self.executor,
+            )
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Соединения потоков создаются с этими же настройками.
+        patcher = mock.patch.dict(connection.settings_dict, {
+            'CONN_MAX_AGE': asgi_settings.DATABASES['default']['CONN_MAX_AGE']
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        # Обертки соединений завершившихся потоков связаны циклическими
+        # ссылками и закрываются только сборщиком мусора.
+        gc.collect()
+
+    def test_connection_reused_by_thread(self):
+        view = async_views.async_read_view(connection_view)
+
+        async def fetch():
+            return await view(type('Request', (), {'method': 'GET'}))
+
+        responses = [asyncio.run(fetch()) for _ in range(10)]
+        threads = {response.thread for response in responses}
+        connections = {id(response.connection) for response in responses}
+        self.assertEqual(len(connections), len(threads))
+
+    def test_short_link_stays_sync(self):
+        match = resolve('/s/abc/', urlconf='api.asgi_urls')
+        self.assertIs(match.func, redirect_to_recipe_view)
+
+
+class AsgiSettingsTest(SimpleTestCase):
+    """Маршруты и постоянные соединения ASGI не влияют на WSGI."""
+
+    def test_persistent_connections_only_under_asgi(self):
+        self.assertEqual(asgi_settings.ROOT_URLCONF, 'api.asgi_urls')
+        self.assertEqual(settings.ROOT_URLCONF, 'api.urls')
+        self.assertGreater(
+            asgi_settings.DATABASES['default']['CONN_MAX_AGE'], 0
+        )
+        self.assertEqual(settings.DATABASES['default']['CONN_MAX_AGE'], 0)
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from api.authentication import SignedTokenAuthentication
+from users.models import CustomUser, RevokedToken
+
+PASSWORD = 'cinnamon-Lq74'
+
+
+@override_settings(AUTH_TOKEN_MODE='jwt')
+class SignedTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Классы аутентификации читаются из настроек при импорте DRF.
+        patcher = mock.patch.object(
+            APIView, 'authentication_classes',
+            [SignedTokenAuthentication, TokenAuthentication],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password=PASSWORD,
+        )
+        self.client = self.login()
+
+    def login(self, password=PASSWORD):
+        client = APIClient()
+        response = client.post('/api/auth/token/login/', {
+            'email': self.user.email, 'password': password,
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        token = response.data['auth_token']
+        self.assertEqual(token.count('.'), 2)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client
+
+    def assertRejected(self, client):
+        for path in (
+            '/api/users/me/',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(client.get(path).status_code, 401)
+
+    def test_user_row_is_cached(self):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+        # Остается только проверка отзыва токена.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_profile_change_is_visible(self):
+        self.client.get('/api/users/me/')
+        self.user.first_name = 'Другое'
+        self.user.save()
+        self.assertEqual(
+            self.client.get('/api/users/me/').data['first_name'], 'Другое'
+        )
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/api/users/me/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertRejected(self.client)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get('/api/users/me/')
+        self.user.delete()
+        self.assertRejected(self.client)
+
+    def test_password_change_revokes_tokens(self):
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': PASSWORD, 'new_password': 'paprika-Zx93',
+        }, format='json')
+        self.assertEqual(response.status_code, 204)
+        self.assertRejected(self.client)
+        client = self.login('paprika-Zx93')
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+
+    def test_logout_revokes_token(self):
+        self.assertEqual(
+            self.client.post('/api/auth/token/logout/').status_code, 204
+        )
+        self.assertRejected(self.client)
+
+    def test_revocation_survives_cache_eviction(self):
+        self.assertEqual(
+            self.client.post('/api/auth/token/logout/').status_code, 204
+        )
+        for number in range(400):
+            cache.set(f'filler:{number}', number)
+        self.assertRejected(self.client)
+        cache.clear()
+        self.assertRejected(self.client)
+
+    def test_expired_revocations_are_removed(self):
+        RevokedToken.objects.create(
+            jti='expired', expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.client.post('/api/auth/token/logout/')
+        self.assertFalse(RevokedToken.objects.filter(jti='expired').exists())
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+    def test_database_tokens_keep_working(self):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
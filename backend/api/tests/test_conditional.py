@@ -0,0 +1,105 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+# Ответ 304 отдается после аутентификации, до сериализации:
+# для рецепта дополнительно читается только дата его изменения.
+LIST_NOT_MODIFIED_QUERIES = 1
+DETAIL_NOT_MODIFIED_QUERIES = 2
+
+
+class ConditionalGetTest(TestCase):
+    """Ответы 304 на рецепты и их сброс после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+        cls.list_url = '/api/recipes/'
+        cls.detail_url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def get(self, url, response=None):
+        headers = {}
+        if response is not None:
+            headers['HTTP_IF_NONE_MATCH'] = response['ETag']
+        return self.client.get(url, **headers)
+
+    def test_not_modified(self):
+        for url, queries in (
+            (self.list_url, LIST_NOT_MODIFIED_QUERIES),
+            (self.detail_url, DETAIL_NOT_MODIFIED_QUERIES),
+        ):
+            with self.subTest(url=url):
+                first = self.get(url)
+                self.assertEqual(first.status_code, 200)
+                with self.assertNumQueries(queries):
+                    response = self.get(url, first)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_validators_are_personal(self):
+        first = self.get(self.detail_url)
+        anonymous = APIClient().get(
+            self.detail_url, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(anonymous.status_code, 200)
+
+    def test_favorite_invalidates(self):
+        first_list = self.get(self.list_url)
+        first_detail = self.get(self.detail_url)
+        response = self.client.post(f'{self.detail_url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        response = self.get(self.list_url, first_list)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+        response = self.get(self.detail_url, first_detail)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+
+    def test_follow_invalidates(self):
+        first = self.get(self.detail_url)
+        response = self.client.post(f'/api/users/{self.author.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        response = self.get(self.detail_url, first)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+    def test_author_edit_invalidates(self):
+        first_list = self.get(self.list_url)
+        first_detail = self.get(self.detail_url)
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        for url, first in (
+            (self.list_url, first_list), (self.detail_url, first_detail)
+        ):
+            with self.subTest(url=url):
+                response = self.get(url, first)
+                self.assertEqual(response.status_code, 200)
+                data = response.data
+                if 'results' in data:
+                    data = data['results'][0]
+                self.assertEqual(data['author']['first_name'], 'Новое имя')
@@ -0,0 +1,42 @@
+import tempfile
+
+from django.test import override_settings, TestCase
+
+from api.dataset import DatasetOptions, generate_dataset
+from users.models import CustomUser
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class GenerateDatasetTest(TestCase):
+    """Сгенерированные пользователи не совпадают с существующими."""
+
+    options = DatasetOptions(
+        users=3, recipes=2, tags=2, ingredients=3, ingredients_per_recipe=2,
+        tags_per_recipe=1, favorites=1, carts=1, follows=1,
+    )
+
+    def create_user(self, username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+
+    def test_existing_names_are_skipped(self):
+        # Имя user<id> выдала бы прежняя схема первому новому
+        # пользователю, а префикс load<первый id>_ уже занят.
+        user = self.create_user('user')
+        first_user = user.id + 2
+        user.username = f'user{first_user}'
+        user.save()
+        self.assertEqual(
+            self.create_user(f'load{first_user}_admin').id + 1, first_user
+        )
+        result = generate_dataset(self.options)
+        self.assertEqual(result.user_ids[0], first_user)
+        self.assertEqual(
+            CustomUser.objects.filter(id__in=result.user_ids).count(), 3
+        )
+        self.assertEqual(
+            CustomUser.objects.get(id=first_user).username,
+            f'load{first_user}_1_{first_user}'
+        )
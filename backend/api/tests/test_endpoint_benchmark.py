@@ -0,0 +1,49 @@
+from django.test import SimpleTestCase
+
+from api.endpoint_benchmark import (
+    check_budget,
+    check_latency,
+    EndpointResult,
+    make_budget,
+)
+
+
+def make_result(queries, latency):
+    return EndpointResult(
+        'recipe-list', requests=1, latencies=[latency], queries=[queries]
+    )
+
+
+class EndpointBudgetTest(SimpleTestCase):
+    """Бюджет запросов зависит от СУБД, задержка не проверяется строго."""
+
+    budget = {
+        'recipe-list': {
+            'queries': {'postgresql': 8, 'sqlite': 7},
+            'p95_ms': 10,
+        },
+    }
+
+    def test_queries_are_checked_per_vendor(self):
+        result = make_result(8, 0.001)
+        self.assertEqual(
+            check_budget([result], self.budget, 'postgresql'), []
+        )
+        self.assertEqual(
+            check_budget([result], self.budget, 'sqlite'),
+            ['recipe-list: 8 SQL-запросов, бюджет 7'],
+        )
+        self.assertEqual(check_budget([result], self.budget, 'mysql'), [])
+
+    def test_latency_is_reported_separately(self):
+        result = make_result(7, 0.5)
+        self.assertEqual(check_budget([result], self.budget, 'sqlite'), [])
+        self.assertEqual(len(check_latency([result], self.budget)), 1)
+
+    def test_write_keeps_other_vendors(self):
+        budget = make_budget(
+            [make_result(9, 0.002)], 3.0, 'postgresql', self.budget
+        )
+        self.assertEqual(budget['recipe-list'], {
+            'queries': {'postgresql': 9, 'sqlite': 7}, 'p95_ms': 6,
+        })
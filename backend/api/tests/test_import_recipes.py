@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from rest_framework.test import APIClient
+
+from api import recipe_transfer
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+
+def make_item(name, tags=(), ingredients=()):
+    return {
+        'author': 'author@example.com',
+        'name': name,
+        'text': 'Описание',
+        'image': 'recipes/images/imported.jpg',
+        'image_renditions': {},
+        'cooking_time': 10,
+        'pub_date': '2024-01-01T12:00:00+00:00',
+        'tags': list(tags),
+        'ingredients': list(ingredients),
+    }
+
+
+class ImportRecipesTest(TransactionTestCase):
+    """Загрузка команды import_recipes; команда закрывает соединение."""
+
+    def setUp(self):
+        cache.clear()
+        CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.client = APIClient()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_file(self, items):
+        path = os.path.join(self.directory, 'recipes.jsonl')
+        with open(path, 'w', encoding='utf-8') as file:
+            for item in items:
+                file.write(json.dumps(item, ensure_ascii=False) + '\n')
+        return path
+
+    def test_new_tags_and_ingredients_are_visible_after_import(self):
+        # Заполняет кэш словаря тегов и индекс ингредиентов.
+        self.assertEqual(
+            self.client.get('/api/recipes/?tags=lunch').json()['count'], 0
+        )
+        self.assertEqual(
+            self.client.get('/api/ingredients/?name=шафран').json(), []
+        )
+        path = self.write_file([make_item(
+            'Плов',
+            tags=[{'slug': 'lunch', 'name': 'Обед'}],
+            ingredients=[{
+                'name': 'шафран', 'measurement_unit': 'г', 'amount': 1
+            }],
+        )])
+
+        call_command('import_recipes', path, stdout=io.StringIO())
+
+        response = self.client.get('/api/recipes/?tags=lunch').json()
+        self.assertEqual(response['count'], 1)
+        self.assertEqual(
+            [item['name'] for item in self.client.get(
+                '/api/ingredients/?name=шафран'
+            ).json()],
+            ['шафран'],
+        )
+
+    def test_tag_with_taken_name_is_reported(self):
+        path = self.write_file([make_item(
+            'Омлет', tags=[{'slug': 'morning', 'name': 'Завтрак'}]
+        )])
+        stderr = io.StringIO()
+
+        call_command(
+            'import_recipes', path, stdout=io.StringIO(), stderr=stderr
+        )
+
+        self.assertIn('morning', stderr.getvalue())
+        self.assertFalse(Tag.objects.filter(slug='morning').exists())
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_resume_after_crash_does_not_duplicate_batches(self):
+        path = self.write_file([
+            make_item('Первый', ingredients=[{
+                'name': 'соль', 'measurement_unit': 'г', 'amount': 1
+            }]),
+            make_item('Второй'),
+        ])
+        checkpoint = os.path.join(self.directory, 'checkpoint.json')
+        write_atomic = recipe_transfer._write_atomic
+        calls = []
+
+        def crash_on_second_batch(checkpoint_path, data):
+            # Сбой после записи контрольной точки второй пачки,
+            # но до фиксации ее транзакции.
+            write_atomic(checkpoint_path, data)
+            if checkpoint_path.endswith('.0'):
+                calls.append(data)
+                if len(calls) == 2:
+                    raise RuntimeError('crash')
+
+        with mock.patch.object(
+            recipe_transfer, '_write_atomic', crash_on_second_batch
+        ), self.assertRaises(RuntimeError):
+            call_command(
+                'import_recipes', path, '--batch-size', '1',
+                '--checkpoint', checkpoint, stdout=io.StringIO(),
+            )
+        self.assertEqual(
+            list(Recipe.objects.values_list('name', flat=True)), ['Первый']
+        )
+
+        call_command(
+            'import_recipes', path, '--batch-size', '1',
+            '--checkpoint', checkpoint, stdout=io.StringIO(),
+        )
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('name', flat=True)),
+            ['Второй', 'Первый'],
+        )
+        self.assertEqual(Ingredient.objects.count(), 1)
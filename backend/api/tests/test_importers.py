@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from api.importers import BulkImporter
+from recipes.models import Ingredient
+
+
+class BulkImporterTest(TestCase):
+    """Повторный импорт пропускает существующие и повторяющиеся строки."""
+
+    fields = ('name', 'measurement_unit')
+
+    def run_import(self, rows, batch_size=2):
+        return BulkImporter(Ingredient, self.fields, batch_size).run(rows)
+
+    def test_counts_inserted_and_skipped(self):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        rows = [
+            {'name': 'соль', 'measurement_unit': 'г'},
+            {'name': 'сахар', 'measurement_unit': 'г'},
+            {'name': 'сахар', 'measurement_unit': 'г'},
+            {'name': 'молоко', 'measurement_unit': 'мл'},
+            {'name': '', 'measurement_unit': 'г'},
+            ['не', 'словарь'],
+        ]
+        result = self.run_import(rows)
+        self.assertEqual(
+            (result.total, result.inserted, result.skipped, result.invalid),
+            (6, 2, 2, 2)
+        )
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+        result = self.run_import(rows)
+        self.assertEqual((result.inserted, result.skipped), (0, 4))
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_values_round_trip(self):
+        row = {'name': 'сыр "Российский", тертый', 'measurement_unit': 'г'}
+        self.assertEqual(self.run_import([row]).inserted, 1)
+        self.assertTrue(Ingredient.objects.filter(**row).exists())
+
+    def test_no_table_counts(self):
+        rows = [
+            {'name': f'ингредиент {number}', 'measurement_unit': 'г'}
+            for number in range(5)
+        ]
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.run_import(rows).inserted, 5)
+        self.assertFalse([
+            query for query in context.captured_queries
+            if 'COUNT(' in query['sql'].upper()
+        ])
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+
+
+class IngredientSearchTest(TestCase):
+    """Поиск ингредиентов по началу названия из индекса в памяти."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Соль', 'сахар', 'Сахарная пудра', 'мука', 'Масло'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, name, **headers):
+        return self.client.get('/api/ingredients/', {'name': name}, **headers)
+
+    def names(self, name):
+        response = self.search(name)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_ignores_case(self):
+        self.assertEqual(self.names('САХ'), ['сахар', 'Сахарная пудра'])
+        self.assertEqual(self.names('м'), ['Масло', 'мука'])
+        self.assertEqual(self.names('перец'), [])
+
+    def test_empty_prefix_returns_all(self):
+        self.assertEqual(len(self.names('')), 5)
+
+    def test_not_modified(self):
+        etag = self.search('са')['ETag']
+        with self.assertNumQueries(0):
+            response = self.search('са', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.search('с')['ETag'], etag)
+
+    def test_ingredient_change_rebuilds_index(self):
+        etag = self.search('са')['ETag']
+        Ingredient.objects.create(name='Сало', measurement_unit='г')
+        response = self.search('са', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in response.data],
+            ['Сало', 'сахар', 'Сахарная пудра'],
+        )
@@ -0,0 +1,55 @@
+import asyncio
+
+from django.http import HttpResponse
+from django.test import (
+    override_settings,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+)
+
+from api.middleware import MetricsMiddleware
+
+
+class MetricsViewTest(TestCase):
+    """Доступ к /api/metrics/ только по токену."""
+
+    url = '/api/metrics/'
+
+    @override_settings(METRICS_TOKEN='')
+    def test_disabled_without_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_wrong_token(self):
+        for header in ('', 'Bearer wrong'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    self.url, HTTP_AUTHORIZATION=header
+                )
+                self.assertEqual(response.status_code, 401)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_valid_token(self):
+        self.client.get('/api/tags/')
+        response = self.client.get(
+            self.url, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'foodgram_request_duration_seconds_count{view="tag-list"}',
+            response.content.decode()
+        )
+
+
+class MetricsMiddlewareTest(SimpleTestCase):
+    """Под ASGI middleware остается корутиной."""
+
+    def test_async_chain(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/')))
+        self.assertIn('Server-Timing', response)
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.pagination import CachedCountPaginator
+from recipes.models import Recipe
+from users.models import CustomUser, Follow
+
+
+class CachedCountPaginatorTest(TestCase):
+    """Количество кэшируется по версиям таблиц, страницы проверяются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        for number in range(5):
+            cls.create_recipe(number)
+
+    @classmethod
+    def create_recipe(cls, number):
+        return Recipe.objects.create(
+            author=cls.author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, per_page=2):
+        return CachedCountPaginator(
+            Recipe.objects.order_by('-id'), per_page
+        )
+
+    def estimate(self, count):
+        return mock.patch.object(
+            CachedCountPaginator, '_estimate_count',
+            return_value=(count, False),
+        )
+
+    def test_count_is_cached(self):
+        self.assertEqual(self.paginator().count, 5)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 5)
+
+    def test_unrelated_write_keeps_count(self):
+        self.assertEqual(self.paginator().count, 5)
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 5)
+
+    def test_related_write_resets_count(self):
+        self.assertEqual(self.paginator().count, 5)
+        self.create_recipe(5)
+        self.assertEqual(self.paginator().count, 6)
+
+    def test_exact_count_validates_pages(self):
+        self.assertFalse(self.paginator().page(3).has_next())
+        with self.assertRaises(EmptyPage):
+            self.paginator().page(4)
+
+    def test_low_estimate_keeps_trailing_pages(self):
+        with self.estimate(1):
+            page = self.paginator().page(3)
+            self.assertEqual(len(page), 1)
+            self.assertFalse(page.has_next())
+            self.assertTrue(self.paginator().page(2).has_next())
+            self.assertEqual(self.paginator().page(2).next_page_number(), 3)
+
+    def test_high_estimate_has_no_empty_pages(self):
+        with self.estimate(1000):
+            paginator = self.paginator()
+            self.assertEqual(paginator.count, 1000)
+            self.assertFalse(paginator.count_is_exact)
+            self.assertFalse(paginator.page(3).has_next())
+            with self.assertRaises(EmptyPage):
+                self.paginator().page(4)
+
+    def test_estimated_response(self):
+        client = APIClient()
+        with self.estimate(1):
+            response = client.get('/api/recipes/', {'limit': 2, 'page': 2})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 1)
+            self.assertFalse(response.data['count_is_exact'])
+            self.assertIsNotNone(response.data['next'])
+            self.assertEqual(
+                client.get(response.data['next']).status_code, 200
+            )
+            response = client.get('/api/recipes/', {'limit': 2, 'page': 4})
+            self.assertEqual(response.status_code, 404)
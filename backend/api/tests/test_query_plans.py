@@ -0,0 +1,57 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+
+from api.dataset import DatasetOptions
+from api.endpoint_benchmark import seed_dataset, STEPS
+from api.filters import IngredientFilterSet
+from api.ingredient_index import index_rows
+from api.query_plans import check_plans, explain, find_full_scans, uses_index
+from recipes.models import Ingredient
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class QueryPlansTest(TestCase):
+    """Запросы всех шагов api.endpoint_benchmark используют индексы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cache.clear()
+        cls.context = seed_dataset(
+            DatasetOptions(users=50, recipes=500, carts=5)
+        )
+
+    def test_endpoints_do_not_scan_tables(self):
+        steps = 0
+        for step, queries, scans in check_plans(self.context, STEPS):
+            steps += 1
+            with self.subTest(step=step.name):
+                self.assertEqual(
+                    [(scan.table, scan.sql) for scan in scans], []
+                )
+        self.assertEqual(steps, len(STEPS))
+
+    def test_ingredient_prefix_search_uses_index(self):
+        sql, params = IngredientFilterSet(
+            {'name': 'Ингредиент 199'}, queryset=Ingredient.objects.all()
+        ).qs.query.sql_with_params()
+        self.assertTrue(
+            uses_index(sql, params, 'ingredient_name_prefix_idx')
+        )
+        self.assertEqual(explain(sql, params), set())
+
+    @mock.patch('api.query_plans.explain', return_value={'recipes_ingredient'})
+    def test_only_index_build_may_scan_ingredients(self, explain):
+        tables = {'recipes_ingredient'}
+        build = index_rows().query.sql_with_params()
+        other = Ingredient.objects.values('id', 'name').query.sql_with_params()
+        self.assertEqual(find_full_scans(STEPS[0], [build], tables), [])
+        self.assertEqual(
+            [
+                scan.table
+                for scan in find_full_scans(STEPS[0], [other], tables)
+            ],
+            ['recipes_ingredient'],
+        )
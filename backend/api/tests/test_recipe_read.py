@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+)
+from users.models import CustomUser, Follow
+
+# Аутентификация, количество (на PostgreSQL перед ним оценка
+# через EXPLAIN), страница рецептов с автором и флагами, строки
+# ингредиентов, ингредиенты, теги, подписки пользователя.
+LIST_QUERIES = {'postgresql': 8, 'sqlite': 7}
+# Курсорная страница с фильтром по тегу: то же без количества,
+# но со словарем тегов.
+CURSOR_QUERIES = 7
+# То же без количества, но с датой изменения рецепта для ETag.
+DETAIL_QUERIES = {'postgresql': 7, 'sqlite': 7}
+
+
+class RecipeReadTest(TestCase):
+    """Число запросов списка и рецепта не зависит от числа рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        cls.recipes = [cls.create_recipe(number) for number in range(3)]
+        FavoriteRecipe.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingList.objects.create(user=cls.reader, recipe=cls.recipes[1])
+
+    @classmethod
+    def create_recipe(cls, number):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=f'Рецепт {number}', text='Описание',
+            image='recipes/images/recipe.jpg', cooking_time=10,
+        )
+        recipe.tags.set(cls.tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+            for ingredient in cls.ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_list(self):
+        with self.assertNumQueries(LIST_QUERIES[connection.vendor]):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        results = {item['id']: item for item in response.data['results']}
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[self.recipes[0].id]['is_favorited'])
+        self.assertFalse(results[self.recipes[0].id]['is_in_shopping_cart'])
+        self.assertTrue(results[self.recipes[1].id]['is_in_shopping_cart'])
+        self.assertTrue(results[self.recipes[2].id]['author']['is_subscribed'])
+        self.assertEqual(len(results[self.recipes[2].id]['ingredients']), 3)
+
+        for number in range(3, 6):
+            self.create_recipe(number)
+        cache.clear()
+        with self.assertNumQueries(LIST_QUERIES[connection.vendor]):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_cursor_pages(self):
+        for number in range(3, 5):
+            self.create_recipe(number)
+        url = (
+            '/api/recipes/?pagination=cursor&limit=2'
+            f'&tags={self.tags[0].slug}'
+        )
+        ids = []
+        while url:
+            cache.clear()
+            with self.assertNumQueries(CURSOR_QUERIES) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any(
+                'COUNT(' in query['sql'] for query in queries.captured_queries
+            ))
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(
+            ids, list(Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            ))
+        )
+
+    def test_detail(self):
+        with self.assertNumQueries(DETAIL_QUERIES[connection.vendor]):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertFalse(response.data['is_in_shopping_cart'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+        self.assertEqual(len(response.data['tags']), 2)
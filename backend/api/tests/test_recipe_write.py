@@ -0,0 +1,199 @@
+import base64
+import io
+import re
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.fields import IntegerField
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.test import APIClient
+
+from PIL import Image
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Поисковый документ на SQLite обновляется двумя запросами.
+CREATE_QUERIES = {'postgresql': 10, 'sqlite': 11}
+PATCH_QUERIES = {'postgresql': 17, 'sqlite': 18}
+# Без изменений ингредиентов и тегов, с одним UPDATE рецепта.
+NOOP_PATCH_QUERIES = {'postgresql': 10, 'sqlite': 10}
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteTest(TestCase):
+    """Число запросов создания и изменения рецепта, включая аутентификацию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.author)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def payload(self, ingredients=((0, 10), (1, 20), (2, 30)), tags=(0, 1)):
+        return {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': make_image(),
+            'tags': [self.tags[index].id for index in tags],
+            'ingredients': [
+                {'id': self.ingredients[index].id, 'amount': amount}
+                for index, amount in ingredients
+            ],
+        }
+
+    def create_recipe(self):
+        response = self.client.post(
+            '/api/recipes/', self.payload(), format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def patch(self, recipe_id, data):
+        return self.client.patch(
+            f'/api/recipes/{recipe_id}/', data, format='json'
+        )
+
+    def assertMatchesDetail(self, response):
+        self.assertEqual(
+            response.json(),
+            self.client.get(f'/api/recipes/{response.data["id"]}/').json(),
+        )
+
+    def test_create(self):
+        with self.assertNumQueries(CREATE_QUERIES[connection.vendor]):
+            response = self.client.post(
+                '/api/recipes/', self.payload(), format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertMatchesDetail(response)
+
+    def test_patch(self):
+        recipe_id = self.create_recipe()
+        data = self.payload(ingredients=((0, 10), (1, 25), (3, 5)))
+        data.pop('image')
+        with self.assertNumQueries(PATCH_QUERIES[connection.vendor]):
+            response = self.patch(recipe_id, data)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(
+                (item['id'], item['amount'])
+                for item in response.data['ingredients']
+            ),
+            [
+                (self.ingredients[0].id, 10), (self.ingredients[1].id, 25),
+                (self.ingredients[3].id, 5),
+            ],
+        )
+        self.assertMatchesDetail(response)
+
+    def test_noop_patch(self):
+        recipe_id = self.create_recipe()
+        data = self.payload()
+        data.pop('image')
+        with self.assertNumQueries(NOOP_PATCH_QUERIES[connection.vendor]):
+            response = self.patch(recipe_id, data)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertMatchesDetail(response)
+
+    def test_partial_patch_updates_only_given_fields(self):
+        recipe_id = self.create_recipe()
+        data = self.payload()
+        for field in ('name', 'text', 'image'):
+            data.pop(field)
+        data['cooking_time'] = 25
+        with self.assertNumQueries(
+                NOOP_PATCH_QUERIES[connection.vendor]) as queries:
+            response = self.patch(recipe_id, data)
+        self.assertEqual(response.status_code, 200, response.data)
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "recipes_recipe"')
+        ]
+        self.assertEqual(len(updates), 1)
+        columns = updates[0].split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(
+            re.findall(r'"(\w+)" =', columns), ['cooking_time', 'modified']
+        )
+        self.assertMatchesDetail(response)
+
+    def test_patch_keeps_concurrent_renditions(self):
+        recipe_id = self.create_recipe()
+        renditions = {'source': 'recipes/built.png', 'files': []}
+
+        def build_renditions(*args):
+            Recipe.objects.filter(pk=recipe_id).update(
+                image_renditions=renditions
+            )
+
+        data = self.payload(ingredients=((0, 15),))
+        data.pop('image')
+        with mock.patch(
+            'api.serializers.refresh_shopping_lists',
+            side_effect=build_renditions,
+        ):
+            response = self.patch(recipe_id, data)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe_id).image_renditions, renditions
+        )
+
+    def test_unknown_ids_keep_related_field_errors(self):
+        field = PrimaryKeyRelatedField(queryset=Tag.objects.all())
+        data = self.payload(ingredients=((0, 10),))
+        data['tags'] = [self.tags[0].id, 999]
+        data['ingredients'].append({'id': 998, 'amount': 1})
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['tags'], [
+            field.error_messages['does_not_exist'].format(pk_value=999)
+        ])
+        self.assertEqual(response.data['ingredients'], [{}, {'id': [
+            field.error_messages['does_not_exist'].format(pk_value=998)
+        ]}])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_non_integer_ids_keep_related_field_errors(self):
+        field = PrimaryKeyRelatedField(queryset=Tag.objects.all())
+        data = self.payload()
+        data['tags'] = ['abc']
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['tags'], [
+            field.error_messages['incorrect_type'].format(data_type='str')
+        ])
+        self.assertNotIn(
+            str(IntegerField.default_error_messages['invalid']),
+            str(response.data),
+        )
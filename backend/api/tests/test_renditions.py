@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from recipes import renditions
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class RenditionQueueTest(SimpleTestCase):
+    """Очередь построения копий не теряет и не дублирует задачи."""
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(self.executor.shutdown)
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.built = []
+        for patcher in (
+            mock.patch.object(renditions, '_executor', self.executor),
+            mock.patch.object(renditions, '_pending', {}),
+            mock.patch.object(
+                renditions, '_build_in_background', self.build
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def build(self, recipe_id):
+        self.started.set()
+        self.release.wait(5)
+        self.built.append(recipe_id)
+
+    def test_finished_jobs_are_forgotten(self):
+        self.release.set()
+        for recipe_id in range(20):
+            renditions._submit(recipe_id)
+        renditions.wait_for_renditions()
+        self.assertEqual(sorted(self.built), list(range(20)))
+        self.assertEqual(renditions._pending, {})
+
+    def test_waiting_job_is_not_duplicated(self):
+        renditions._submit(1)
+        self.started.wait(5)
+        renditions._submit(2)
+        renditions._submit(2)
+        # Начатая задача могла прочитать старую картинку.
+        renditions._submit(1)
+        self.release.set()
+        renditions.wait_for_renditions()
+        self.assertEqual(sorted(self.built), [1, 1, 2])
+
+
+class LazyRenditionsTest(TestCase):
+    """Чтение рецепта без копий снова ставит их в очередь."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/test.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('api.serializers.schedule_renditions')
+    def test_missing_renditions_are_scheduled(self, schedule):
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        schedule.assert_called_once_with(self.recipe.id)
+
+    @mock.patch('api.serializers.schedule_renditions')
+    def test_current_renditions_are_not_scheduled(self, schedule):
+        Recipe.objects.filter(pk=self.recipe.pk).update(image_renditions={
+            'source': self.recipe.image.name, 'files': [],
+        })
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        schedule.assert_not_called()
+
+    @mock.patch('api.serializers.schedule_renditions')
+    def test_queued_renditions_are_not_scheduled_again(self, schedule):
+        with mock.patch.object(
+            renditions, '_pending', {self.recipe.id: Future()}
+        ):
+            response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        schedule.assert_not_called()
+
+    @mock.patch('api.serializers.schedule_renditions')
+    def test_missing_source_failure_is_recorded(self, schedule):
+        with self.assertRaises(Exception):
+            renditions.build_renditions(self.recipe)
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.image_renditions['source'], self.recipe.image.name
+        )
+        self.assertIn('error', self.recipe.image_renditions)
+        self.assertTrue(renditions.renditions_failed(self.recipe))
+
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['image_srcset'], {})
+        schedule.assert_not_called()
@@ -0,0 +1,249 @@
+import os
+import tempfile
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings, RequestFactory, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from api.cache import bump_cache_version, VERSION_KEY
+from api.conditional import CATALOG_CACHE
+from api.pagination import CachedCountPaginator
+from api.replica import (
+    _use_replica,
+    can_use_replica,
+    catalog_may_lag,
+    DEFAULT,
+    pin_to_primary,
+    PINNED_KEY,
+    REPLICA,
+    ReplicaRouter,
+)
+from recipes.models import Recipe
+from users.models import CustomUser
+
+WITH_REPLICA = {**settings.DATABASES, REPLICA: settings.DATABASES[DEFAULT]}
+
+
+class ReplicaRouterTest(TestCase):
+
+    def test_reads_follow_context(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT)
+        token = _use_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Recipe), REPLICA)
+            self.assertEqual(router.db_for_write(Recipe), DEFAULT)
+        finally:
+            _use_replica.reset(token)
+
+    def test_migrations_only_on_primary(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate(DEFAULT, 'recipes'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'recipes'))
+
+    def test_counts_read_from_primary(self):
+        # Псевдонима replica в тестах нет: запрос к нему упал бы.
+        token = _use_replica.set(True)
+        try:
+            paginator = CachedCountPaginator(Recipe.objects.all(), 10)
+            self.assertEqual(paginator.count, 0)
+        finally:
+            _use_replica.reset(token)
+
+
+@override_settings(DATABASES=WITH_REPLICA)
+class CanUseReplicaTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, method='get', user=None):
+        request = Request(getattr(RequestFactory(), method)('/api/recipes/'))
+        request.user = user or self.user
+        return request
+
+    def test_safe_request_uses_replica(self):
+        self.assertTrue(can_use_replica(self.request()))
+
+    def test_anonymous_uses_replica(self):
+        self.assertTrue(can_use_replica(self.request(user=AnonymousUser())))
+
+    def test_unsafe_request(self):
+        self.assertFalse(can_use_replica(self.request('post')))
+
+    @override_settings(DATABASES={DEFAULT: settings.DATABASES[DEFAULT]})
+    def test_without_replica(self):
+        self.assertFalse(can_use_replica(self.request()))
+
+    def test_pinned_user(self):
+        pin_to_primary(self.user)
+        self.assertFalse(can_use_replica(self.request()))
+
+    def test_pin_is_per_user(self):
+        other = CustomUser.objects.create_user(
+            username='other', email='other@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        pin_to_primary(other)
+        self.assertTrue(can_use_replica(self.request()))
+
+
+class CatalogMayLagTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(_use_replica.reset, _use_replica.set(True))
+
+    def set_catalog_age(self, seconds):
+        cache.set(
+            VERSION_KEY.format(CATALOG_CACHE),
+            int((time.time() - seconds) * 1000), None
+        )
+
+    def test_recent_change(self):
+        self.set_catalog_age(0)
+        self.assertTrue(catalog_may_lag())
+
+    def test_old_change(self):
+        self.set_catalog_age(settings.REPLICA_STICKY_SECONDS + 1)
+        self.assertFalse(catalog_may_lag())
+
+    def test_primary_never_lags(self):
+        self.set_catalog_age(0)
+        _use_replica.set(False)
+        self.assertFalse(catalog_may_lag())
+
+
+class StickinessTest(TestCase):
+    """После успешного изменения пользователь читает с основной базы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def subscribe(self, author_id):
+        return self.client.post(f'/api/users/{author_id}/subscribe/')
+
+    def test_successful_write_pins(self):
+        self.assertEqual(self.subscribe(self.author.id).status_code, 201)
+        self.assertTrue(cache.get(PINNED_KEY.format(self.reader.id)))
+
+    def test_failed_write_does_not_pin(self):
+        self.assertEqual(self.subscribe(self.reader.id).status_code, 400)
+        self.assertIsNone(cache.get(PINNED_KEY.format(self.reader.id)))
+
+
+class ReplicaReadTest(TestCase):
+    """
+    Список рецептов читается с отдельной базы SQLite под псевдонимом
+    replica: рецепт есть только в ней, а не в основной базе.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплику подключаем после подготовки тестовых баз: тестовый
+        # раннер не знает про этот псевдоним и не создает для него базу.
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory.name, 'replica.sqlite3'),
+        }
+        cls.databases_override = override_settings(DATABASES={
+            **settings.DATABASES, REPLICA: connections.settings[REPLICA]
+        })
+        cls.databases_override.enable()
+        # migrate не создает таблицы на реплике (allow_migrate).
+        with connections[REPLICA].schema_editor() as editor:
+            for app_label in ('users', 'recipes'):
+                for model in apps.get_app_config(app_label).get_models():
+                    editor.create_model(model)
+        author = CustomUser.objects.db_manager(REPLICA).create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        Recipe.objects.using(REPLICA).create(
+            author=author, name=f'Рецепт из {REPLICA}', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.databases_override.disable()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.reader)
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        Recipe.objects.create(
+            author=author, name=f'Рецепт из {DEFAULT}', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def names(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.data['results']]
+
+    def test_list_served_by_replica(self):
+        self.assertEqual(self.names(), [f'Рецепт из {REPLICA}'])
+
+    def test_pinned_reader_served_by_primary(self):
+        pin_to_primary(self.reader)
+        self.assertEqual(self.names(), [f'Рецепт из {DEFAULT}'])
+
+    def test_recent_catalog_change_not_cached(self):
+        bump_cache_version(CATALOG_CACHE)
+        client = APIClient()
+        for _ in range(2):
+            response = client.get('/api/recipes/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertNotIn('ETag', response)
+            self.assertEqual(
+                [recipe['name'] for recipe in response.data['results']],
+                [f'Рецепт из {REPLICA}'],
+            )
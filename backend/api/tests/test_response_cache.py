@@ -0,0 +1,102 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.response_cache import get_response_cache_stats
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import CustomUser
+
+
+class ResponseCacheTest(TestCase):
+    """Кэш ответов анонимным пользователям и его сброс по версии."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.tag = Tag.objects.create(name='Обед', slug='lunch')
+        cls.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=5
+        )
+        cls.detail_url = f'/api/recipes/{cls.recipe.id}/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_hit_after_miss(self):
+        # Для рецепта до кэша читается дата изменения для валидаторов.
+        for url, queries in (('/api/recipes/', 0), (self.detail_url, 1)):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+                with self.assertNumQueries(queries):
+                    response = self.get(url)
+                self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(
+            get_response_cache_stats(), {'hits': 2, 'misses': 2}
+        )
+
+    def test_key_ignores_parameter_order(self):
+        self.client.get('/api/recipes/?limit=5&tags=lunch')
+        response = self.client.get('/api/recipes/?tags=lunch&limit=5')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get('/api/recipes/?tags=lunch&limit=6')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_authenticated_not_cached(self):
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertNotIn('X-Cache', self.get('/api/recipes/'))
+        self.assertEqual(
+            get_response_cache_stats(), {'hits': 0, 'misses': 0}
+        )
+
+    def test_missing_recipe_not_cached(self):
+        for _ in range(2):
+            response = self.client.get('/api/recipes/0/')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(get_response_cache_stats()['hits'], 0)
+
+    def test_catalog_writes_invalidate(self):
+        writes = (
+            (Recipe, self.recipe.pk, {'cooking_time': 20}),
+            (Tag, self.tag.pk, {'name': 'Ужин'}),
+            (Ingredient, self.ingredient.pk, {'measurement_unit': 'кг'}),
+        )
+        for model, pk, fields in writes:
+            with self.subTest(model=model.__name__):
+                self.get(self.detail_url)
+                self.assertEqual(self.get(self.detail_url)['X-Cache'], 'HIT')
+                instance = model.objects.get(pk=pk)
+                for field, value in fields.items():
+                    setattr(instance, field, value)
+                instance.save()
+                self.assertEqual(
+                    self.get(self.detail_url)['X-Cache'], 'MISS'
+                )
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': tempfile.mkdtemp(),
+}})
+class FileBasedResponseCacheTest(ResponseCacheTest):
+    """То же с файловым кэшем."""
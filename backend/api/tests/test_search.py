@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.search import update_search_index
+from users.models import CustomUser
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск сортирует рецепты по релевантности при любой пагинации."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.by_name, cls.by_text, _ = (
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=10,
+                image='recipes/images/test.png',
+            )
+            for name, text in (
+                ('Суп', 'Горячий обед'),
+                ('Пирог', 'Подавать вместо супа'),
+                ('Салат', 'Холодная закуска'),
+            )
+        )
+        update_search_index(Recipe.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'суп', **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_by_relevance(self):
+        results = self.search()['results']
+        self.assertEqual(
+            [recipe['id'] for recipe in results],
+            [self.by_name.id, self.by_text.id]
+        )
+
+    def test_cursor_pagination_keeps_relevance(self):
+        data = self.search(pagination='cursor')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(
+            [recipe['id'] for recipe in data['results']],
+            [self.by_name.id, self.by_text.id]
+        )
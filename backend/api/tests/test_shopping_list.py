@@ -0,0 +1,132 @@
+import csv
+import io
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.shopping_list import cache_stream
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    Tag,
+)
+from users.models import CustomUser
+
+
+class DownloadShoppingCartTest(TestCase):
+    """Выгрузка списка покупок в разных форматах и ее кэш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.buyer)
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл'
+        )
+        for name, amounts in (('Блины', (200, 500)), ('Пирог', (300, 100))):
+            recipe = Recipe.objects.create(
+                author=cls.buyer, name=name, text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=amount)
+                for ingredient, amount in zip((cls.flour, cls.milk), amounts)
+            )
+            ShoppingList.objects.create(user=cls.buyer, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def download(self, file_format):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'file_format': file_format},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="shopping_list.{file_format}"',
+        )
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_txt(self):
+        self.assertEqual(
+            self.download('txt').decode(),
+            'молоко(мл) - 600\nмука(г) - 500\n',
+        )
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.download('csv').decode())))
+        self.assertEqual(rows, [
+            ['Ингредиент', 'Единица измерения', 'Количество'],
+            ['молоко', 'мл', '600'],
+            ['мука', 'г', '500'],
+        ])
+
+    def test_pdf(self):
+        content = self.download('pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/', {'file_format': 'xls'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_file(self):
+        content = self.download('txt')
+        response = self.client.get('/api/recipes/download_shopping_cart/')
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, content)
+
+    def test_ingredient_edit_invalidates_cache(self):
+        self.download('txt')
+        self.flour.name = 'мука пшеничная'
+        self.flour.save()
+        self.assertIn('мука пшеничная(г) - 500', self.download('txt').decode())
+
+    def test_recipe_edit_invalidates_cache(self):
+        self.download('txt')
+        recipe = Recipe.objects.get(name='Блины')
+        response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+            'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.flour.id, 'amount': 250},
+                {'id': self.milk.id, 'amount': 500},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIn('мука(г) - 550', self.download('txt').decode())
+
+
+class CacheStreamTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_small_file_is_cached(self):
+        chunks = [b'a' * 10, b'b' * 10]
+        self.assertEqual(list(cache_stream(iter(chunks), 'key', 20)), chunks)
+        self.assertEqual(cache.get('key'), b'a' * 10 + b'b' * 10)
+
+    def test_large_file_is_not_cached(self):
+        chunks = [b'a' * 10, b'b' * 10, b'c']
+        self.assertEqual(list(cache_stream(iter(chunks), 'key', 20)), chunks)
+        self.assertIsNone(cache.get('key'))
@@ -0,0 +1,156 @@
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import skipUnlessDBFeature, TestCase, TransactionTestCase
+
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingList,
+    ShoppingListIngredient,
+)
+from users.models import CustomUser
+
+
+class ShoppingListTotalsTest(TestCase):
+    """Суммы ингредиентов следуют за корзиной и составом рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.buyer = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.flour, cls.milk, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'соль')
+        )
+        cls.pancakes = cls.create_recipe(
+            'Блины', ((cls.flour, 200), (cls.milk, 500))
+        )
+        cls.bread = cls.create_recipe(
+            'Хлеб', ((cls.flour, 400), (cls.salt, 10))
+        )
+
+    @classmethod
+    def create_recipe(cls, name, ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author, name=name, text='Описание', cooking_time=10,
+            image='recipes/test.png',
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in ingredients
+        )
+        return recipe
+
+    def totals(self, user=None):
+        return {
+            item.ingredient.name: item.total_amount
+            for item in ShoppingListIngredient.objects.filter(
+                user=user or self.buyer
+            ).select_related('ingredient')
+        }
+
+    def add(self, *recipes):
+        for recipe in recipes:
+            ShoppingList.objects.create(user=self.buyer, recipe=recipe)
+
+    def test_add(self):
+        self.add(self.pancakes)
+        self.assertEqual(self.totals(), {'мука': 200, 'молоко': 500})
+        self.add(self.bread)
+        self.assertEqual(
+            self.totals(), {'мука': 600, 'молоко': 500, 'соль': 10}
+        )
+        self.assertEqual(self.totals(self.author), {})
+
+    def test_remove(self):
+        self.add(self.pancakes, self.bread)
+        ShoppingList.objects.get(recipe=self.pancakes).delete()
+        self.assertEqual(self.totals(), {'мука': 400, 'соль': 10})
+        ShoppingList.objects.get(recipe=self.bread).delete()
+        self.assertEqual(self.totals(), {})
+
+    def test_recipe_delete_cascade(self):
+        self.add(self.pancakes, self.bread)
+        self.bread.delete()
+        self.assertEqual(self.totals(), {'мука': 200, 'молоко': 500})
+
+    def test_ingredient_delete_cascade(self):
+        self.add(self.pancakes, self.bread)
+        self.flour.delete()
+        self.assertEqual(self.totals(), {'молоко': 500, 'соль': 10})
+
+    def test_rebuild(self):
+        self.add(self.pancakes, self.bread)
+        expected = self.totals()
+        ShoppingListIngredient.objects.filter(
+            ingredient=self.flour
+        ).update(total_amount=1)
+        ShoppingListIngredient.objects.filter(ingredient=self.salt).delete()
+        with self.assertRaises(CommandError):
+            call_command(
+                'rebuild_shopping_lists', verify=True,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+        call_command('rebuild_shopping_lists', stdout=StringIO())
+        self.assertEqual(self.totals(), expected)
+        call_command(
+            'rebuild_shopping_lists', verify=True, stdout=StringIO()
+        )
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentShoppingListTotalsTest(TransactionTestCase):
+    """Одновременные добавления в корзину не теряют и не дублируют суммы."""
+
+    def test_concurrent_adds(self):
+        buyer = CustomUser.objects.create_user(
+            username='buyer', email='buyer@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        recipes = []
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                author=buyer, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10, image='recipes/test.png',
+            )
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=flour, amount=10
+            )
+            recipes.append(recipe)
+        barrier = threading.Barrier(len(recipes))
+        errors = []
+
+        def add(recipe):
+            try:
+                barrier.wait(5)
+                ShoppingList.objects.create(user=buyer, recipe=recipe)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=add, args=(recipe,))
+            for recipe in recipes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            ShoppingListIngredient.objects.get(user=buyer).total_amount, 80
+        )
@@ -0,0 +1,65 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import make_short_id, Recipe, SHORT_ID_ALPHABET
+from users.models import CustomUser
+
+
+class ShortIdTest(TestCase):
+    """Короткие id перемешаны для любых pk и не требуют UPDATE."""
+
+    def test_large_pks_are_permuted(self):
+        for pk in (2 ** 32, 2 ** 32 + 1, 2 ** 40 - 1):
+            with self.subTest(pk=pk):
+                short_id = make_short_id(pk)
+                self.assertEqual(len(short_id), 7)
+                value = 0
+                for char in short_id:
+                    value = value * len(SHORT_ID_ALPHABET) + (
+                        SHORT_ID_ALPHABET.index(char)
+                    )
+                self.assertNotEqual(value, pk)
+        short_ids = {make_short_id(2 ** 32 + pk) for pk in range(1000)}
+        self.assertEqual(len(short_ids), 1000)
+
+    def test_create_writes_short_id(self):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        with CaptureQueriesContext(connection) as queries:
+            recipe = Recipe.objects.create(
+                author=author, name='Рецепт', text='Описание',
+                cooking_time=10, image='recipes/images/test.png',
+            )
+        self.assertEqual(recipe.short_id, make_short_id(recipe.pk))
+        self.assertEqual(
+            Recipe.objects.get(pk=recipe.pk).short_id, recipe.short_id
+        )
+        updates = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        if connection.vendor == 'postgresql':
+            self.assertEqual(updates, [])
+
+
+class ShortLinkRedirectTest(TestCase):
+
+    def test_deleted_recipe_is_not_redirected(self):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/images/test.png',
+        )
+        url = recipe.get_short_url()
+        response = self.client.get(url)
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}/', fetch_redirect_response=False
+        )
+        recipe.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
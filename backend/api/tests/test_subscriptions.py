@@ -0,0 +1,80 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import CustomUser, Follow
+
+# Аутентификация, количество (на PostgreSQL перед ним оценка
+# через EXPLAIN), страница авторов, их рецепты, подписки читателя.
+SUBSCRIPTIONS_QUERIES = {'postgresql': 6, 'sqlite': 5}
+
+
+class SubscriptionsTest(TestCase):
+    """Список подписок: порядок, лимит рецептов и число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = cls.create_user('reader')
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.authors = []
+        for number in range(8):
+            author = cls.create_user(f'author{number}')
+            for index in range(number % 4):
+                Recipe.objects.create(
+                    author=author, name=f'Рецепт {number}-{index}',
+                    text='Описание', cooking_time=10,
+                    image='recipes/test.png',
+                )
+            cls.authors.append(author)
+        # Подписки в порядке, отличном от id авторов.
+        for author in reversed(cls.authors):
+            Follow.objects.create(user=cls.reader, author=author)
+
+    @staticmethod
+    def create_user(username):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def get(self, **params):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            response = self.client.get('/api/users/subscriptions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_follow_order(self):
+        data = self.get(limit=3)
+        self.assertEqual(data['count'], 8)
+        self.assertEqual(
+            [author['id'] for author in data['results']],
+            [author.id for author in reversed(self.authors)][:3],
+        )
+
+    def test_recipes_limit_per_author(self):
+        data = self.get(limit=8, recipes_limit=2)
+        for author in data['results']:
+            with self.subTest(author=author['username']):
+                total = Recipe.objects.filter(author_id=author['id']).count()
+                self.assertEqual(author['recipes_count'], total)
+                self.assertEqual(len(author['recipes']), min(total, 2))
+
+    def test_query_count_does_not_grow(self):
+        queries = SUBSCRIPTIONS_QUERIES[connection.vendor]
+        for limit in (2, 8):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    self.get(limit=limit, recipes_limit=1)
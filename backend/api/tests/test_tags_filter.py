@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from users.models import CustomUser
+
+
+class TagsFilterTest(TestCase):
+    """Фильтр рецептов по слагам тегов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.breakfast, cls.lunch, cls.dinner = (
+            Tag.objects.create(name=name, slug=slug)
+            for name, slug in (
+                ('Завтрак', 'breakfast'), ('Обед', 'lunch'),
+                ('Ужин', 'dinner'),
+            )
+        )
+        cls.both, cls.only_lunch, cls.untagged = (
+            Recipe.objects.create(
+                author=author, name=name, text='Описание', cooking_time=10,
+                image='recipes/test.png',
+            )
+            for name in ('Каша', 'Суп', 'Чай')
+        )
+        cls.both.tags.set([cls.breakfast, cls.lunch])
+        cls.only_lunch.tags.set([cls.lunch])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def ids(self, *slugs):
+        response = self.client.get('/api/recipes/', {'tags': slugs})
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.data['results'])
+
+    def test_any_of_tags_without_duplicates(self):
+        self.assertEqual(
+            self.ids('breakfast', 'lunch'),
+            sorted([self.both.id, self.only_lunch.id]),
+        )
+        self.assertEqual(self.ids('breakfast'), [self.both.id])
+
+    def test_unknown_slug_returns_empty_list(self):
+        self.assertEqual(self.ids('unknown'), [])
+        self.assertEqual(self.ids('dinner'), [])
+        self.assertEqual(self.ids('unknown', 'breakfast'), [self.both.id])
+
+    def test_tag_map_is_cached(self):
+        self.ids('lunch')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.ids('breakfast'), [self.both.id])
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT "recipes_tag"."slug"')
+            or 'DISTINCT' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_new_tag_is_found(self):
+        self.ids('lunch')
+        brunch = Tag.objects.create(name='Бранч', slug='brunch')
+        self.untagged.tags.set([brunch])
+        self.assertEqual(self.ids('brunch'), [self.untagged.id])
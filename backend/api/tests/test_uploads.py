@@ -0,0 +1,196 @@
+import base64
+import io
+import json
+import shutil
+import struct
+import tempfile
+import zlib
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from PIL import Image
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import CustomUser
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_png(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def make_png_bomb(width=100000, height=100000):
+    """PNG, в заголовке которого указано огромное разрешение."""
+    content = make_png((1, 1))
+    header = b'IHDR' + struct.pack('>II', width, height) + content[24:29]
+    return (
+        content[:12] + header
+        + struct.pack('>I', zlib.crc32(header)) + content[33:]
+    )
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    """Картинки принимаются в base64, multipart и телом запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+        )
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(2)
+        ]
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def form(self, image=None, **fields):
+        data = {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': json.dumps(
+                [{'id': self.ingredient.id, 'amount': 100}]
+            ),
+            **fields,
+        }
+        if image is not None:
+            data['image'] = SimpleUploadedFile(
+                'cake.png', image, content_type='image/png'
+            )
+        return data
+
+    def put_avatar(self, content, content_type='image/png'):
+        return self.client.put(
+            '/api/users/me/avatar/', content, content_type=content_type
+        )
+
+    def test_multipart_recipe_create(self):
+        response = self.client.post(
+            '/api/recipes/', self.form(make_png()), format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertEqual(
+            sorted(tag['id'] for tag in response.data['tags']),
+            [tag.id for tag in self.tags],
+        )
+        self.assertEqual(response.data['ingredients'][0]['amount'], 100)
+
+    def test_multipart_recipe_patch(self):
+        recipe_id = self.client.post(
+            '/api/recipes/', self.form(make_png()), format='multipart'
+        ).data['id']
+        old_image = Recipe.objects.get(pk=recipe_id).image.name
+        response = self.client.patch(
+            f'/api/recipes/{recipe_id}/',
+            self.form(
+                make_png((16, 16)), name='Новое название',
+                tags=json.dumps([self.tags[0].id]),
+            ),
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe = Recipe.objects.get(pk=recipe_id)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertNotEqual(recipe.image.name, old_image)
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']], [self.tags[0].id]
+        )
+
+    def test_multipart_invalid_ingredients(self):
+        response = self.client.post(
+            '/api/recipes/', self.form(make_png(), ingredients='['),
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.data)
+
+    def test_raw_avatar(self):
+        response = self.put_avatar(make_png())
+        self.assertEqual(response.status_code, 200, response.data)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar.name.endswith('.png'))
+
+    def test_multipart_avatar(self):
+        response = self.client.put(
+            '/api/users/me/avatar/',
+            {'avatar': SimpleUploadedFile(
+                'avatar.png', make_png(), content_type='image/png'
+            )},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_base64_json(self):
+        image = 'data:image/png;base64,' + base64.b64encode(
+            make_png()
+        ).decode()
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': image}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        data = self.form()
+        data['image'] = image
+        data['ingredients'] = json.loads(data['ingredients'])
+        response = self.client.post('/api/recipes/', data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    @mock.patch('api.fields.MAX_IMAGE_UPLOAD_SIZE', 1024)
+    def test_oversize_body(self):
+        content = make_png((256, 256))
+        content += b'\0' * (2048 - len(content))
+        response = self.put_avatar(content)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/recipes/', self.form(content), format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+    def test_pixel_bomb(self):
+        # Выше MAX_IMAGE_PIXELS и выше предела самого Pillow.
+        for size in ((8000, 8000), (100000, 100000)):
+            with self.subTest(size=size):
+                content = make_png_bomb(*size)
+                response = self.put_avatar(content)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('пикселей', str(response.data['avatar']))
+                response = self.client.post(
+                    '/api/recipes/', self.form(content), format='multipart'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('пикселей', str(response.data['image']))
+
+    def test_corrupt_image(self):
+        response = self.put_avatar(b'not an image at all')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            '/api/recipes/', self.form(b'\x89PNG broken'), format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import CustomUser, Follow
+
+# Аутентификация, количество (на PostgreSQL перед ним оценка
+# через EXPLAIN), страница пользователей, подписки читателя.
+USER_LIST_QUERIES = {'postgresql': 5, 'sqlite': 4}
+
+
+class UserListTest(TestCase):
+    """is_subscribed списка пользователей djoser стоит один запрос."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # djoser с HIDE_USERS показывает остальных пользователей
+        # в списке только персоналу.
+        cls.reader = cls.create_user('reader', is_staff=True)
+        cls.token = Token.objects.create(user=cls.reader)
+        cls.authors = [
+            cls.create_user(f'author{number}') for number in range(6)
+        ]
+        for author in cls.authors[::2]:
+            Follow.objects.create(user=cls.reader, author=author)
+
+    @staticmethod
+    def create_user(username, **fields):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com',
+            first_name='Имя', last_name='Фамилия', password='pass-Lq74-xx',
+            **fields
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_is_subscribed(self):
+        response = self.client.get('/api/users/', {'limit': 10})
+        self.assertEqual(response.status_code, 200)
+        subscribed = {
+            user['id'] for user in response.data['results']
+            if user['is_subscribed']
+        }
+        self.assertEqual(
+            subscribed, {author.id for author in self.authors[::2]}
+        )
+
+    def test_query_count_does_not_grow(self):
+        queries = USER_LIST_QUERIES[connection.vendor]
+        for limit in (2, 7):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get('/api/users/', {'limit': limit})
+                self.assertEqual(len(response.data['results']), limit)
@@ -2,11 +2,17 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
-from djoser.views import TokenCreateView, TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
-from api.utils import redirect_to_recipe_view
-from api.views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from api.utils import metrics_view, redirect_to_recipe_view
+from api.views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    TokenLoginView,
+    TokenLogoutView,
+    UserViewSet,
+)
 
 router = DefaultRouter()
 router.register('users', UserViewSet, basename='user')
@@ -17,14 +23,15 @@ router.register('recipes', RecipeViewSet, basename='recipe')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/auth/', include('djoser.urls')),
-    path('api/auth/', include('djoser.urls.authtoken')),
     path('api/auth/token/login/',
-         TokenCreateView.as_view(),
+         TokenLoginView.as_view(),
          name='token_login'),
     path('api/auth/token/logout/',
-         TokenDestroyView.as_view(),
+         TokenLogoutView.as_view(),
          name='token_logout'),
+    path('api/auth/', include('djoser.urls')),
+    path('api/auth/', include('djoser.urls.authtoken')),
+    path('api/metrics/', metrics_view, name='metrics'),
     path('api/', include(router.urls)),
     path('s/<slug:short_id>/', redirect_to_recipe_view,
          name='redirect_to_recipe'),
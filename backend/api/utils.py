@@ -1,9 +1,56 @@
-from django.shortcuts import get_object_or_404, redirect
+import hmac
+from functools import lru_cache
 
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect
+
+from api.cache import get_cache_version
+from api.constants import SHORT_LINK_CACHE_SIZE
+from api.metrics import registry
 from recipes.models import Recipe
 
+SHORT_LINKS_CACHE = 'short_links'
+
+
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def _get_recipe_id(short_id, version):
+    return Recipe.objects.values_list('id', flat=True).get(short_id=short_id)
+
+
+def get_recipe_id(short_id):
+    """
+    Id рецепта по короткому id.
+
+    Результаты хранятся в LRU-кэше процесса вместе с версией
+    SHORT_LINKS_CACHE, которая меняется при удалении рецепта: после
+    удаления старые записи не используются и вытесняются из кэша.
+    Отсутствующие id не кэшируются: исключение lru_cache не запоминает.
+    """
+    return _get_recipe_id(short_id, get_cache_version(SHORT_LINKS_CACHE))
+
 
 def redirect_to_recipe_view(request, short_id):
     """Перенаправляет на страницу рецепта по короткому ID."""
-    recipe = get_object_or_404(Recipe, short_id=short_id)
-    return redirect(f'/recipes/{recipe.id}/')
+    try:
+        recipe_id = get_recipe_id(short_id)
+    except Recipe.DoesNotExist:
+        raise Http404('Рецепт не найден.')
+    return redirect(f'/recipes/{recipe_id}/')
+
+
+def metrics_view(request):
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    Без METRICS_TOKEN эндпоинт отключен.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not hmac.compare_digest(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
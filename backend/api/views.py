@@ -1,17 +1,55 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    prefetch_related_objects,
+    Subquery,
+    Value,
+    Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, RowNumber
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
+from djoser.views import TokenCreateView, TokenDestroyView
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import create_auth_token, JWT_MODE, revoke_token
+from api.conditional import (
+    conditional_response,
+    get_list_validators,
+    get_recipe_validators,
+    set_validators,
+)
 from api.filters import IngredientFilterSet, RecipeFilterSet
-from api.pagination import PageLimitPaginator
+from api.ingredient_index import ingredient_index
+from api.pagination import PageLimitPaginator, RecipeCursorPaginator
+from api.parsers import ImageUploadParser
 from api.permissions import IsAuthorOrReadOnly
+from api.replica import catalog_may_lag, ReplicaReadMixin
+from api.response_cache import (
+    get_cached_data,
+    get_response_cache_key,
+    set_cached_data,
+)
 from api.serializers import (
     AvatarSerializer,
     FavoriteRecipeSerializer,
@@ -23,6 +61,12 @@ from api.serializers import (
     TagSerializer,
     UserSerializer,
 )
+from api.shopping_list import (
+    cache_stream,
+    get_cache_key,
+    get_shopping_list_rows,
+    SHOPPING_LIST_FORMATS,
+)
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
@@ -34,7 +78,31 @@ from recipes.models import (
 from users.models import CustomUser, Follow
 
 
-class UserViewSet(DjoserUserViewSet):
+class TokenLoginView(TokenCreateView):
+    """Вход: в режиме jwt выдается подписанный токен вместо токена из базы"""
+
+    def _action(self, serializer):
+        if settings.AUTH_TOKEN_MODE != JWT_MODE:
+            return super()._action(serializer)
+        user = serializer.user
+        user_logged_in.send(
+            sender=user.__class__, request=self.request, user=user
+        )
+        return Response(
+            {'auth_token': create_auth_token(user)}, status=status.HTTP_200_OK
+        )
+
+
+class TokenLogoutView(TokenDestroyView):
+    """Выход: подписанный токен отзывается, токены из базы удаляются"""
+
+    def post(self, request):
+        if isinstance(request.auth, AccessToken):
+            revoke_token(request.auth)
+        return super().post(request)
+
+
+class UserViewSet(ReplicaReadMixin, DjoserUserViewSet):
     """ViewSet пользователя"""
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
@@ -48,11 +116,18 @@ class UserViewSet(DjoserUserViewSet):
         return super().me(request)
 
     @action(detail=False, methods=['PUT'], url_path='me/avatar',
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            parser_classes=[JSONParser, MultiPartParser, ImageUploadParser])
     def set_avatar(self, request):
-        """Добавить/удалить аватар"""
+        """
+        Добавить/удалить аватар. Картинка принимается в base64 внутри
+        JSON, полем avatar в multipart/form-data или телом запроса.
+        """
+        data = request.data
+        if 'file' in data and 'avatar' not in data:
+            data = {'avatar': data['file']}
         serializer = AvatarSerializer(
-            instance=request.user, data=request.data, partial=True
+            instance=request.user, data=data, partial=True
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -71,13 +146,59 @@ class UserViewSet(DjoserUserViewSet):
     @action(detail=False, methods=['GET'],
             permission_classes=[permissions.IsAuthenticated])
     def subscriptions(self, request):
-        """Получение авторов, на которых подписан пользователь"""
-        queryset = CustomUser.objects.filter(following__user=request.user)
+        """
+        Получение авторов, на которых подписан пользователь, в порядке
+        подписки: новые подписки попадают в конец и не сдвигают страницы.
+        Количество рецептов считается подзапросом, без GROUP BY по
+        пользователям.
+        """
+        recipes_count = Recipe.objects.filter(
+            author=OuterRef('pk')
+        ).order_by().values('author').annotate(count=Count('id'))
+        queryset = CustomUser.objects.filter(
+            following__user=request.user
+        ).annotate(
+            recipes_count=Coalesce(
+                Subquery(recipes_count.values('count')), 0
+            )
+        ).order_by('following__id')
         page = self.paginate_queryset(queryset)
+        recipes_limit = FollowerRetrieveSerializer.get_recipes_limit(request)
+        prefetch_related_objects(page, Prefetch(
+            'recipes',
+            queryset=self._get_limited_recipes(
+                [author.id for author in page], recipes_limit
+            ),
+            to_attr='limited_recipes',
+        ))
         serializer = FollowerRetrieveSerializer(
             page, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def _get_limited_recipes(author_ids, recipes_limit):
+        """
+        Первые recipes_limit рецептов каждого автора одним запросом.
+
+        Рецепты нумеруются оконной функцией ROW_NUMBER() в разрезе автора,
+        в выборку попадают строки с номером не больше лимита.
+        """
+        recipes = Recipe.objects.all()
+        if recipes_limit is None:
+            return recipes
+        ranked = Recipe.objects.filter(author_id__in=author_ids).annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).order_by().values('id', 'position')
+        sql, params = ranked.query.sql_with_params()
+        return recipes.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE position <= %s',
+            (*params, recipes_limit)
+        ))
+
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated], url_path="subscribe")
     def subscribe(self, request, id=None):
@@ -106,7 +227,7 @@ class UserViewSet(DjoserUserViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Управление тегами."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -114,7 +235,7 @@ class TagViewSet(ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReadOnlyModelViewSet):
     """Обрабатывает запросы к ингредиентам."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -123,19 +244,155 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск по началу названия выполняется по индексу в памяти.
+
+        Ответ снабжается ETag, повторный запрос с If-None-Match
+        получает 304 без обращения к базе данных.
+        """
+        name = request.query_params.get('name', '')
+        version, ingredients = ingredient_index.search(name)
+        etag = '"{}-{}"'.format(
+            version, hashlib.md5(name.casefold().encode()).hexdigest()
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = Response(ingredients)
+        response['ETag'] = etag
+        return response
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Обрабатывает запросы к рецептам."""
-    queryset = Recipe.objects.prefetch_related(
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        # Ингредиенты упорядочивает сериализатор: сортировка по названию
+        # в запросе добавляла JOIN с полным чтением справочника.
+        Prefetch(
+            'recipe_ingredients', queryset=RecipeIngredient.objects.order_by()
+        ),
         'recipe_ingredients__ingredient', 'tags'
     )
     serializer_class = RecipeSerializer
     pagination_class = PageLimitPaginator
+    cursor_pagination_class = RecipeCursorPaginator
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilterSet
     permission_classes = [IsAuthorOrReadOnly]
+    parser_classes = (JSONParser, MultiPartParser)
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    @property
+    def paginator(self):
+        """
+        Курсорная пагинация включается параметром ?pagination=cursor,
+        по умолчанию остается постраничная с count/next/previous.
+        Результаты поиска всегда постраничные: курсор по дате сбросил бы
+        сортировку по релевантности.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if not params.get('search') and (
+                params.get('pagination') == 'cursor'
+                or RecipeCursorPaginator.cursor_query_param in params
+            ):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов с ответом 304 для актуальной копии клиента."""
+        etag, last_modified = get_list_validators(request)
+        response = conditional_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = self._cached_response(
+            super().list, request, *args, **kwargs
+        )
+        if catalog_may_lag():
+            # Данные реплики могут быть старше версии каталога в ETag.
+            return response
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Рецепт с ответом 304 для актуальной копии клиента.
+
+        Валидаторы строятся по дате изменения рецепта до сериализации.
+        """
+        try:
+            modified = Recipe.objects.filter(pk=kwargs['pk']).values_list(
+                'modified', flat=True
+            ).first()
+        except (TypeError, ValueError):
+            modified = None
+        if modified is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = get_recipe_validators(
+            request, kwargs['pk'], modified
+        )
+        response = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = set_validators(
+                self._cached_response(
+                    super().retrieve, request, *args, **kwargs
+                ),
+                etag, last_modified
+            )
+        return response
+
+    @staticmethod
+    def _cached_response(handler, request, *args, **kwargs):
+        """Ответы анонимным пользователям берутся из кэша."""
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = get_response_cache_key(request)
+        data = get_cached_data(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if (response.status_code == status.HTTP_200_OK
+                and not catalog_may_lag()):
+            set_cached_data(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def get_queryset(self):
+        """
+        Аннотирует рецепты флагами избранного и корзины,
+        чтобы не выполнять отдельный запрос для каждого рецепта.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return self.queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+            )
+        return self.queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingList.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
+    def update(self, request, *args, **kwargs):
+        """
+        В отличие от UpdateModelMixin кэш prefetch_related не сбрасывается:
+        сериализатор сам кладет в него актуальные теги и ингредиенты.
+        """
+        serializer = self.get_serializer(
+            self.get_object(), data=request.data,
+            partial=kwargs.pop('partial', False)
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['GET'], url_path='get-link',
             permission_classes=[permissions.AllowAny])
     def get_link(self, request, pk=None):
@@ -153,7 +410,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = ShoppingCartSerializer(data=data,
                                             context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
         return Response(
             serializer.data,
             status=status.HTTP_201_CREATED
@@ -163,8 +421,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def remove_shopping_cart(self, request, pk=None):
         """Удаление рецепта из корзины."""
         recipe = get_object_or_404(Recipe, id=pk)
-        deleted_count, _ = ShoppingList.objects.filter(user=request.user,
-                                                       recipe=recipe).delete()
+        with transaction.atomic():
+            deleted_count, _ = ShoppingList.objects.filter(
+                user=request.user, recipe=recipe
+            ).delete()
         if not deleted_count:
             return Response(
                 {'detail': 'Рецепт отсутствует в корзине пользователя.'},
@@ -179,25 +439,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
             permission_classes=[permissions.IsAuthenticated],
             url_path='download_shopping_cart')
     def download_shopping_cart(self, request):
-        """Список покупок"""
-        user = request.user
-        recipes_in_cart = ShoppingList.objects.filter(
-            user=user).values_list('recipe', flat=True)
-        ingredients = (
-            RecipeIngredient.objects.filter(recipe__in=recipes_in_cart)
-            .values('ingredient__name',
-                    'ingredient__measurement_unit')
-            .annotate(total_amount=Sum('amount'))
-        )
-        response_content = '\n'.join(
-            f'{item["ingredient__name"]}'
-            f'({item["ingredient__measurement_unit"]}) - '
-            f'{item["total_amount"]}'
-            for item in ingredients
+        """
+        Список покупок в формате txt, csv или pdf (?file_format=).
+
+        txt и csv отдаются потоком по мере чтения строк, pdf собирается
+        в памяти. Небольшие файлы кэшируются по содержимому корзины.
+        """
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'file_format': 'Доступные форматы: '
+                 f'{", ".join(SHOPPING_LIST_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content_type, render = SHOPPING_LIST_FORMATS[file_format]
+        recipe_ids = list(ShoppingList.objects.filter(
+            user=request.user).values_list('recipe_id', flat=True))
+        cache_key = get_cache_key(recipe_ids, file_format)
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                cache_stream(
+                    render(get_shopping_list_rows(request.user)), cache_key
+                ),
+                content_type=content_type
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{file_format}"'
         )
-        response = HttpResponse(response_content, content_type='text/plain')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
         return response
 
     @action(methods=['POST'], detail=True,
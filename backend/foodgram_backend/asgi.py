@@ -2,5 +2,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+os.environ.setdefault(
+    'DJANGO_SETTINGS_MODULE', 'foodgram_backend.asgi_settings'
+)
 application = get_asgi_application()
@@ -0,0 +1,22 @@
+"""
+Настройки запуска под ASGI (foodgram_backend/asgi.py).
+
+Горячие эндпоинты чтения заменены асинхронными обертками
+(api.asgi_urls), которые выполняются в постоянном пуле потоков
+(api.async_views). Соединение с базой принадлежит потоку пула
+и переиспользуется, пока не устареет.
+"""
+import os
+
+from foodgram_backend.settings import *  # noqa: F401, F403
+from foodgram_backend.settings import DATABASES
+
+ROOT_URLCONF = 'api.asgi_urls'
+
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+    }
+    for alias, database in DATABASES.items()
+}
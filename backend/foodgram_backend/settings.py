@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from django.core.management.utils import get_random_secret_key
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +44,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Под ASGI маршруты заменяет foodgram_backend.asgi_settings.
 ROOT_URLCONF = 'api.urls'
 
 TEMPLATES = [
@@ -69,8 +72,14 @@ if SQLITE:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
         }
     }
+    if os.getenv('SQLITE_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': os.getenv('SQLITE_REPLICA_NAME'),
+        }
 else:
     DATABASES = {
         'default': {
@@ -80,8 +89,38 @@ else:
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
             'PORT': os.getenv('DB_PORT', 5432),
+            # Постоянные соединения включаются под ASGI
+            # (foodgram_backend.asgi_settings).
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
         }
+
+# Реплика для чтения (api.replica). В тестах она указывает на default.
+if 'replica' in DATABASES:
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['api.replica.ReplicaRouter']
+# Сколько секунд после изменения данных чтение идет с основной базы.
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# LocMemCache по умолчанию хранит данные и версии кэша (api.cache)
+# в памяти каждого процесса. При нескольких воркерах gunicorn нужен
+# общий кэш, иначе воркер не видит изменений, сделанных другими:
+# индекс ингредиентов, словарь тегов, отзыв токенов и закрепление
+# за основной базой остаются устаревшими.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
     }
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,6 +155,38 @@ STATIC_ROOT = '/backend_static/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Загружаемые картинки сразу пишутся во временный файл, а не в память.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# /api/metrics/ требует заголовок Authorization: Bearer <токен>,
+# без токена эндпоинт отвечает 404.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Потоки для асинхронных оберток чтения под ASGI (api.async_views),
+# у каждого потока свое соединение с базой.
+ASYNC_READ_WORKERS = int(os.getenv('ASYNC_READ_WORKERS', 8))
+
+IMAGE_RENDITION_WORKERS = int(os.getenv('IMAGE_RENDITION_WORKERS', 2))
+
+SHORT_ID_KEY = os.getenv('SHORT_ID_KEY', 'foodgram-short-links')
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# token - токены в базе (authtoken), jwt - подписанные токены, которые
+# проверяются без запроса к таблице токенов (api.authentication).
+AUTH_TOKEN_MODE = os.getenv('AUTH_TOKEN_MODE', 'token')
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_LIFETIME_MINUTES', 24 * 60))
+    ),
+    'AUTH_HEADER_TYPES': ('Token', 'Bearer'),
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -128,6 +199,11 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPaginator',
 }
+if AUTH_TOKEN_MODE == 'jwt':
+    # Токены из базы, выданные до переключения, продолжают работать.
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'].insert(
+        0, 'api.authentication.SignedTokenAuthentication'
+    )
 
 
 DJOSER = {
@@ -1,13 +1,16 @@
 from django.contrib import admin
 
+from api.shopping_list import refresh_shopping_lists
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
     Recipe,
     RecipeIngredient,
     ShoppingList,
+    ShoppingListIngredient,
     Tag,
 )
+from recipes.search import update_search_index
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -29,6 +32,19 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('pub_date',)
     save_on_top = True
 
+    def save_related(self, request, form, formsets, change):
+        """Пересчитывает списки покупок после правки ингредиентов."""
+        recipe = form.instance
+        ingredient_ids = set(recipe.recipe_ingredients.values_list(
+            'ingredient_id', flat=True
+        ))
+        super().save_related(request, form, formsets, change)
+        ingredient_ids.update(recipe.recipe_ingredients.values_list(
+            'ingredient_id', flat=True
+        ))
+        refresh_shopping_lists(recipe, ingredient_ids)
+        update_search_index([recipe.id])
+
 
 @admin.register(FavoriteRecipe)
 class FavoriteRecipeAdmin(admin.ModelAdmin):
@@ -49,6 +65,17 @@ class ShoppingListAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
 
 
+@admin.register(ShoppingListIngredient)
+class ShoppingListIngredientAdmin(admin.ModelAdmin):
+    """
+    Интерфейс администратора для просмотра сумм ингредиентов
+    в списках покупок.
+    """
+
+    list_display = ('user', 'ingredient', 'total_amount')
+    search_fields = ('user__username', 'ingredient__name')
+
+
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """
@@ -0,0 +1,73 @@
+from django.db import migrations
+
+# SQL скопирован из recipes.search на момент миграции. Столбец
+# search_vector и таблица FTS5 не описаны в модели: makemigrations
+# их не видит, а flush не очищает таблицу FTS5.
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('russian', recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+SQLITE_INGREDIENTS = """
+    coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')
+"""
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_idx '
+            'ON recipes_recipe USING GIN (search_vector)'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe AS recipe '
+            f'SET search_vector = {POSTGRES_DOCUMENT}'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts '
+            'USING fts5(name, ingredients, text)'
+        )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+            f'SELECT recipe.id, recipe.name, {SQLITE_INGREDIENTS}, '
+            'recipe.text FROM recipes_recipe AS recipe'
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_shoppinglistingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
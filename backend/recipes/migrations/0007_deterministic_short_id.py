@@ -0,0 +1,66 @@
+import hashlib
+import string
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Копия recipes.models.make_short_id на момент миграции: изменения
+# модели не должны менять уже записанные id.
+SHORT_ID_ALPHABET = string.digits + string.ascii_letters
+SHORT_ID_BLOCKS = ((32, 6), (40, 7))
+SHORT_ID_ROUNDS = 4
+
+
+def _feistel_round(value, round_number, bits):
+    size = (bits + 7) // 8
+    digest = hashlib.blake2b(
+        value.to_bytes(size, 'big'),
+        digest_size=size,
+        key=settings.SHORT_ID_KEY.encode(),
+        salt=round_number.to_bytes(16, 'big'),
+    ).digest()
+    return int.from_bytes(digest, 'big') & ((1 << bits) - 1)
+
+
+def make_short_id(pk):
+    for bits, length in SHORT_ID_BLOCKS:
+        if pk < 2 ** bits:
+            break
+    else:
+        raise ValueError(f'Слишком большой id рецепта для ссылки: {pk}.')
+    half = bits // 2
+    left, right = pk >> half, pk & ((1 << half) - 1)
+    for round_number in range(SHORT_ID_ROUNDS):
+        left, right = right, left ^ _feistel_round(right, round_number, half)
+    value = (left << half) | right
+    short_id = ''
+    while value:
+        value, digit = divmod(value, len(SHORT_ID_ALPHABET))
+        short_id = SHORT_ID_ALPHABET[digit] + short_id
+    return short_id.rjust(length, SHORT_ID_ALPHABET[0])
+
+
+def backfill_short_ids(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.filter(
+        models.Q(short_id='') | models.Q(short_id__isnull=True)
+    ).only('id')
+    for recipe in recipes.iterator():
+        recipe.short_id = make_short_id(recipe.id)
+        recipe.save(update_fields=['short_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_modified'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_id',
+            field=models.CharField(blank=True, help_text='Короткое значение ссылки рецепта', max_length=8, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_short_ids, migrations.RunPython.noop),
+    ]
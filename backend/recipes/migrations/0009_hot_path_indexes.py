@@ -0,0 +1,60 @@
+# Generated by Django 3.2.3 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+# Индекс для поиска ингредиентов по началу названия без учета регистра
+# (istartswith). На PostgreSQL выражение совпадает с тем, что строит
+# Django: UPPER("name"::text) LIKE UPPER(%s), text_pattern_ops нужен
+# для LIKE при локали, отличной от C. На SQLite LIKE без учета регистра
+# использует индекс только с сопоставлением NOCASE.
+INGREDIENT_NAME_INDEX = 'ingredient_name_prefix_idx'
+CREATE_INGREDIENT_NAME_INDEX = {
+    'postgresql': (
+        f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_INDEX} '
+        'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+    ),
+    'sqlite': (
+        f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_INDEX} '
+        'ON recipes_ingredient (name COLLATE NOCASE)'
+    ),
+}
+
+
+def create_ingredient_name_index(apps, schema_editor):
+    sql = CREATE_INGREDIENT_NAME_INDEX.get(schema_editor.connection.vendor)
+    if sql:
+        schema_editor.execute(sql)
+
+
+def drop_ingredient_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INGREDIENT_NAME_INDEX:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {INGREDIENT_NAME_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='recipeingredient',
+            name='unique_ingredient_recipe',
+        ),
+        migrations.RunPython(
+            create_ingredient_name_index, drop_ingredient_name_index
+        ),
+    ]
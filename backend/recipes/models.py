@@ -1,8 +1,11 @@
-import random
+import hashlib
 import string
 
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Sum
+from django.utils import timezone
 
 from api.constants import (
     MAX_AMOUNT_INGR,
@@ -17,6 +20,62 @@ from api.constants import (
 )
 from users.models import CustomUser
 
+SHORT_ID_ALPHABET = string.digits + string.ascii_letters
+# Ширина блока сети Фейстеля в битах и длина короткого id.
+SHORT_ID_BLOCKS = ((32, 6), (40, 7))
+SHORT_ID_ROUNDS = 4
+
+
+def _feistel_round(value, round_number, bits):
+    size = (bits + 7) // 8
+    digest = hashlib.blake2b(
+        value.to_bytes(size, 'big'),
+        digest_size=size,
+        key=settings.SHORT_ID_KEY.encode(),
+        salt=round_number.to_bytes(16, 'big'),
+    ).digest()
+    return int.from_bytes(digest, 'big') & ((1 << bits) - 1)
+
+
+def make_short_id(pk):
+    """
+    Короткий id рецепта из первичного ключа.
+
+    Ключ перемешивается сетью Фейстеля (биекция 32- или 40-битных
+    чисел с секретом SHORT_ID_KEY) и записывается в base62: 6 символов
+    для pk < 2**32 и 7 для больших. Разные pk всегда дают разные id,
+    поэтому проверка на существование не нужна. Новые id короче
+    8-символьных случайных id прежней схемы и не могут с ними совпасть.
+    """
+    for bits, length in SHORT_ID_BLOCKS:
+        if pk < 2 ** bits:
+            break
+    else:
+        raise ValueError(f'Слишком большой id рецепта для ссылки: {pk}.')
+    half = bits // 2
+    left, right = pk >> half, pk & ((1 << half) - 1)
+    for round_number in range(SHORT_ID_ROUNDS):
+        left, right = right, left ^ _feistel_round(right, round_number, half)
+    value = (left << half) | right
+    short_id = ''
+    while value:
+        value, digit = divmod(value, len(SHORT_ID_ALPHABET))
+        short_id = SHORT_ID_ALPHABET[digit] + short_id
+    return short_id.rjust(length, SHORT_ID_ALPHABET[0])
+
+
+def _next_id(model, using):
+    """Следующий id из последовательности PostgreSQL, иначе None."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s))',
+            [model._meta.db_table, model._meta.pk.column]
+        )
+        return cursor.fetchone()[0]
+
 
 class Tag(models.Model):
     """Модель для тегов"""
@@ -77,6 +136,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         help_text='Картинка вашего рецепта'
     )
+    image_renditions = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Текст рецепта',
         help_text='Описание рецепта'
@@ -110,10 +175,15 @@ class Recipe(models.Model):
         verbose_name='Дата создания',
         auto_now_add=True
     )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     short_id = models.CharField(
         max_length=MAX_LENGTH_SHORT_LINK,
         unique=True,
         blank=True,
+        null=True,
         help_text='Короткое значение ссылки рецепта'
     )
 
@@ -121,22 +191,43 @@ class Recipe(models.Model):
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Рецепт: {self.name} (Автор: {self.author})'
 
-    def generate_short_id(self):
-        """Создает случайную строку для short_id"""
-        characters = string.ascii_letters + string.digits
-        return ''.join(random.choices(characters, k=MAX_LENGTH_SHORT_LINK))
-
     def save(self, *args, **kwargs):
-        """Генерируем short_id только при создании нового объекта"""
-        if not self.short_id:
-            self.short_id = self.generate_short_id()
-            while Recipe.objects.filter(short_id=self.short_id).exists():
-                self.short_id = self.generate_short_id()
+        """
+        Генерируем short_id по pk. На PostgreSQL pk берется из
+        последовательности заранее и short_id пишется тем же INSERT,
+        на SQLite — отдельным UPDATE после создания объекта.
+        """
+        if self.pk is None and not self.short_id:
+            using = kwargs.get('using') or router.db_for_write(
+                type(self), instance=self
+            )
+            self.pk = _next_id(type(self), using)
+            if self.pk is not None:
+                kwargs['force_insert'] = True
+        if self.pk is not None and not self.short_id:
+            self.short_id = make_short_id(self.pk)
         super().save(*args, **kwargs)
+        if not self.short_id:
+            self.short_id = make_short_id(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(short_id=self.short_id)
+
+    @classmethod
+    def touch(cls, **lookups):
+        """Обновляет дату изменения рецептов без вызова save()."""
+        cls.objects.filter(**lookups).update(modified=timezone.now())
 
     def get_short_url(self):
         """Возвращает URL короткой ссылки."""
@@ -172,9 +263,10 @@ class RecipeIngredient(models.Model):
         verbose_name_plural = 'Ингредиенты в рецептах с количеством'
         ordering = ('ingredient',)
         constraints = [
+            # Рецепт первым: ингредиенты читаются по рецепту.
             models.UniqueConstraint(
-                fields=['ingredient', 'recipe'],
-                name='unique_ingredient_recipe'
+                fields=['recipe', 'ingredient'],
+                name='unique_recipe_ingredient'
             )
         ]
 
@@ -243,3 +335,97 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name} в корзине у {self.user.username}'
+
+
+class ShoppingListIngredientManager(models.Manager):
+    """Менеджер суммарных количеств ингредиентов в списках покупок"""
+
+    def lock_users(self, user_ids):
+        """
+        Блокирует строки пользователей до конца транзакции и возвращает
+        их id. Пересчеты списков одного пользователя выполняются по
+        очереди и видят корзину, зафиксированную предыдущим.
+        """
+        return list(
+            CustomUser.objects.select_for_update()
+            .filter(pk__in=user_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def refresh(self, user_ids, ingredient_ids):
+        """
+        Пересчитывает суммы для пар (пользователь, ингредиент).
+
+        user_ids и ingredient_ids могут быть списками или подзапросами.
+        """
+        with transaction.atomic():
+            user_ids = self.lock_users(user_ids)
+            if not user_ids:
+                return
+            totals = (
+                RecipeIngredient.objects.filter(
+                    recipe__in_shopping_carts__user__in=user_ids,
+                    ingredient__in=ingredient_ids,
+                )
+                .values('recipe__in_shopping_carts__user', 'ingredient')
+                .annotate(total_amount=Sum('amount'))
+                .order_by()
+            )
+            rows = [
+                self.model(
+                    user_id=item['recipe__in_shopping_carts__user'],
+                    ingredient_id=item['ingredient'],
+                    total_amount=item['total_amount'],
+                )
+                for item in totals
+            ]
+            self.filter(
+                user__in=user_ids, ingredient__in=ingredient_ids
+            ).delete()
+            self.bulk_create(rows)
+
+    def refresh_for_recipe(self, recipe, ingredient_ids):
+        """Пересчет для всех пользователей с рецептом в корзине."""
+        self.refresh(
+            ShoppingList.objects.filter(recipe=recipe).values('user'),
+            ingredient_ids,
+        )
+
+
+class ShoppingListIngredient(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок"""
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_ingredients',
+        verbose_name='Покупатель'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_totals',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Суммарное количество ингредиента'
+    )
+
+    objects = ShoppingListIngredientManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        ordering = ('user',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'{self.ingredient.name} - {self.total_amount}'
+            f'{self.ingredient.measurement_unit} у {self.user.username}'
+        )
@@ -0,0 +1,207 @@
+"""
+Уменьшенные копии картинок рецептов.
+
+Для каждого размера из IMAGE_RENDITIONS сохраняются две копии: в формате
+оригинала (JPEG, либо PNG для картинок с прозрачностью) и в WebP. Копии
+строятся в пуле потоков после фиксации транзакции, описание хранится
+в Recipe.image_renditions вместе с именем исходного файла, чтобы
+устаревшие копии можно было распознать после замены картинки.
+
+Очередь живет в памяти процесса и теряется при перезапуске. Рецепт
+без актуальных копий снова ставится в очередь при чтении
+(api.serializers.ImageSrcsetField), а все недостающие копии строит
+команда build_image_renditions. Ошибка построения тоже сохраняется
+в описании, чтобы битая или пропавшая картинка не ставилась в очередь
+при каждом чтении; такие рецепты повторно обрабатывает только команда.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from PIL import Image, ImageOps
+
+from api.cache import bump_cache_version
+from api.conditional import CATALOG_CACHE
+from api.constants import IMAGE_RENDITION_QUALITY, IMAGE_RENDITIONS
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions/'
+# Общие картинки-заглушки сгенерированных данных (api.dataset)
+# и их копии используются многими рецептами и не удаляются.
+PLACEHOLDER_DIR = 'recipes/placeholders/'
+WEBP = ('WEBP', 'webp', 'image/webp')
+JPEG = ('JPEG', 'jpg', 'image/jpeg')
+PNG = ('PNG', 'png', 'image/png')
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_RENDITION_WORKERS,
+    thread_name_prefix='renditions',
+)
+_lock = threading.Lock()
+# Поставленные в очередь задачи по id рецепта.
+_pending = {}
+
+
+def needs_renditions(recipe):
+    """Копии отсутствуют или построены по другой картинке."""
+    return bool(recipe.image) and (
+        recipe.image_renditions.get('source') != recipe.image.name
+    )
+
+
+def renditions_failed(recipe):
+    """Построение копий текущей картинки завершилось ошибкой."""
+    return not needs_renditions(recipe) and (
+        'error' in recipe.image_renditions
+    )
+
+
+def renditions_queued(recipe_id):
+    """Построение копий рецепта уже стоит в очереди или выполняется."""
+    with _lock:
+        queued = _pending.get(recipe_id)
+        return queued is not None and not queued.done()
+
+
+def schedule_renditions(recipe_id):
+    """Ставит построение копий в очередь после фиксации транзакции."""
+    transaction.on_commit(lambda: _submit(recipe_id))
+
+
+def _submit(recipe_id):
+    with _lock:
+        queued = _pending.get(recipe_id)
+        # Задача, которая еще не начата, прочитает свежую картинку.
+        if queued is not None and not queued.running() and not queued.done():
+            return
+        future = _executor.submit(_build_in_background, recipe_id)
+        _pending[recipe_id] = future
+    # Вне блокировки: для завершенной задачи обработчик вызывается сразу.
+    future.add_done_callback(lambda done: _forget(recipe_id, done))
+
+
+def _forget(recipe_id, future):
+    with _lock:
+        if _pending.get(recipe_id) is future:
+            del _pending[recipe_id]
+
+
+def build_renditions(recipe):
+    """
+    Строит копии картинки рецепта и сохраняет их описание.
+    Возвращает False, если картинка успела смениться. Ошибка чтения
+    картинки сохраняется в описании и пробрасывается дальше.
+    """
+    source = recipe.image.name
+    storage = recipe.image.storage
+    try:
+        files = render_renditions(storage, source)
+    except Exception as error:
+        record_failure(recipe, source, error)
+        raise
+    updated = Recipe.objects.filter(pk=recipe.pk, image=source).update(
+        image_renditions={'source': source, 'files': files},
+        modified=timezone.now(),
+    )
+    if not updated:
+        delete_renditions(storage, files)
+        return False
+    delete_renditions(storage, recipe.image_renditions.get('files', ()))
+    recipe.image_renditions = {'source': source, 'files': files}
+    bump_cache_version(CATALOG_CACHE)
+    return True
+
+
+def record_failure(recipe, source, error):
+    """
+    Сохраняет ошибку построения копий картинки source, если картинка
+    не успела смениться. Прежние копии больше не описаны и удаляются.
+    """
+    updated = Recipe.objects.filter(pk=recipe.pk, image=source).update(
+        image_renditions={'source': source, 'error': str(error)},
+        modified=timezone.now(),
+    )
+    if updated:
+        delete_renditions(
+            recipe.image.storage, recipe.image_renditions.get('files', ())
+        )
+        bump_cache_version(CATALOG_CACHE)
+    return bool(updated)
+
+
+def render_renditions(storage, source, directory=RENDITIONS_DIR):
+    """Сохраняет копии картинки source и возвращает их описание."""
+    with storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    has_alpha = image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+    fallback = PNG if has_alpha else JPEG
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    files = []
+    built_widths = set()
+    for name, width in IMAGE_RENDITIONS:
+        width = min(width, image.width)
+        if width in built_widths:
+            continue
+        built_widths.add(width)
+        resized = image
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        for image_format, extension, content_type in (WEBP, fallback):
+            buffer = io.BytesIO()
+            resized.save(
+                buffer, image_format,
+                quality=IMAGE_RENDITION_QUALITY, optimize=True
+            )
+            path = storage.save(
+                f'{directory}{stem}_{name}.{extension}',
+                ContentFile(buffer.getvalue())
+            )
+            files.append({
+                'name': name,
+                'width': width,
+                'type': content_type,
+                'path': path,
+            })
+    return files
+
+
+def delete_renditions(storage, files):
+    """Удаляет файлы копий из хранилища."""
+    for item in files:
+        if not item['path'].startswith(PLACEHOLDER_DIR):
+            storage.delete(item['path'])
+
+
+def wait_for_renditions():
+    """Дожидается построения поставленных в очередь копий."""
+    with _lock:
+        futures = list(_pending.values())
+    wait(futures)
+
+
+def _build_in_background(recipe_id):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe is not None and needs_renditions(recipe):
+            build_renditions(recipe)
+    except Exception:
+        logger.exception(
+            'Не удалось построить копии картинки рецепта %s', recipe_id
+        )
+    finally:
+        connection.close()
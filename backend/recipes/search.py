@@ -0,0 +1,174 @@
+"""
+Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+На PostgreSQL документ хранится в столбце recipes_recipe.search_vector
+(tsvector, конфигурация russian) с GIN-индексом, на SQLite — в теневой
+таблице FTS5 recipes_recipe_fts, где rowid совпадает с id рецепта.
+
+Столбец и таблица создаются миграцией 0005 и не описаны в модели,
+поэтому Django о них не знает: makemigrations их не видит, flush
+не очищает таблицу FTS5 (на SQLite в ней остаются документы удаленных
+рецептов, пока их id не займут новые), а тестовая база получает их
+только при прогоне миграций. После загрузки данных в обход ORM
+или flush индекс пересчитывается командой rebuild_search_index.
+"""
+import re
+
+from django.db import connection as default_connection
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+BATCH_SIZE = 500
+
+POSTGRES_DOCUMENT = """
+    setweight(to_tsvector('russian', recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+SQLITE_INGREDIENTS = """
+    coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')
+"""
+
+
+def create_search_index(connection):
+    """Создает хранилище поискового индекса для текущей СУБД."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+            )
+            cursor.execute(
+                'CREATE INDEX recipes_recipe_search_vector_idx '
+                'ON recipes_recipe USING GIN (search_vector)'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+                'USING fts5(name, ingredients, text)'
+            )
+
+
+def drop_search_index(connection):
+    """Удаляет хранилище поискового индекса."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+def update_search_index(recipe_ids, connection=default_connection):
+    """Пересчитывает поисковые документы рецептов с данными id."""
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        _update_batch(recipe_ids[start:start + BATCH_SIZE], connection)
+
+
+def rebuild_search_index(connection=default_connection):
+    """Пересчитывает поисковые документы всех рецептов."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'UPDATE recipes_recipe AS recipe '
+                f'SET search_vector = {POSTGRES_DOCUMENT}'
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                f'SELECT recipe.id, recipe.name, {SQLITE_INGREDIENTS}, '
+                'recipe.text FROM recipes_recipe AS recipe'
+            )
+
+
+def remove_from_search_index(recipe_ids, connection=default_connection):
+    """Удаляет документы удаленных рецептов из таблицы FTS5."""
+    recipe_ids = list(recipe_ids)
+    if connection.vendor != 'sqlite' or not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def _update_batch(recipe_ids, connection):
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'UPDATE recipes_recipe AS recipe '
+                f'SET search_vector = {POSTGRES_DOCUMENT} '
+                'WHERE recipe.id = ANY(%s)',
+                [recipe_ids]
+            )
+        elif connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                f'SELECT recipe.id, recipe.name, {SQLITE_INGREDIENTS}, '
+                'recipe.text FROM recipes_recipe AS recipe '
+                f'WHERE recipe.id IN ({placeholders})',
+                recipe_ids
+            )
+
+
+def search_recipes(queryset, query):
+    """
+    Отбирает рецепты, подходящие под поисковый запрос,
+    и сортирует их по релевантности.
+    """
+    vendor = default_connection.vendor
+    if vendor == 'postgresql':
+        matched = RawSQL(
+            'SELECT id FROM recipes_recipe WHERE search_vector '
+            "@@ websearch_to_tsquery('russian', %s)",
+            (query,)
+        )
+        rank = RawSQL(
+            'ts_rank(recipes_recipe.search_vector, '
+            "websearch_to_tsquery('russian', %s))",
+            (query,)
+        )
+    elif vendor == 'sqlite':
+        words = re.findall(r'\w+', query)
+        if not words:
+            return queryset.none()
+        query = ' '.join(f'"{word}"*' for word in words)
+        matched = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            (query,)
+        )
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            'AND rowid = recipes_recipe.id',
+            (query,)
+        )
+    else:
+        return queryset.filter(name__icontains=query)
+    return queryset.filter(id__in=matched).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date')
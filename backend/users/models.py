@@ -5,6 +5,7 @@ from django.db import models
 from api.constants import (
     MAX_LENGTH_FIRST_NAME,
     MAX_LENGTH_LAST_NAME,
+    MAX_LENGTH_TOKEN_ID,
     MAX_LENGTH_USERNAME,
 )
 
@@ -77,6 +78,28 @@ class Follow(models.Model):
                 name='unique_follow_model'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.author.username}'
+
+
+class RevokedToken(models.Model):
+    """Подписанный токен, отозванный при выходе, до истечения его срока"""
+    jti = models.CharField(
+        'Идентификатор токена',
+        max_length=MAX_LENGTH_TOKEN_ID,
+        unique=True
+    )
+    expires_at = models.DateTimeField('Истекает', db_index=True)
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti